@@ -1,24 +1,33 @@
 from __future__ import annotations
 import discord
-from datetime import datetime, timedelta
+from datetime import date, timedelta
 from localization import tg
 from config import (
-    get_guild_config, get_role, get_member, modify_role,
-    validate_date, add_or_update_entry, remove_entry, DEFAULT_ROLE_NAME, ABSENCE_MANAGER_THUMB_URL
+    get_guild_config, get_absence_role, get_member, modify_role,
+    validate_date, parse_entry_date, add_or_update_entry, remove_entry, get_entry, update_entry, entry_lock,
+    DEFAULT_ROLE_NAME, ABSENCE_MANAGER_THUMB_URL
 )
-from logger import logger
+from logger import get_logger
+from dates import format_date
+from metrics import track_interaction
+
+logger = get_logger(__name__)
 
 async def log_absence_event_by_guild(client: discord.Client, guild_id: int, message: str):
-    guild = client.get_guild(guild_id)
-    if not guild:
+    config = get_guild_config(guild_id)
+    if not config.get("logging_channel_id") and not config.get("logging_webhook_url"):
         return
 
-    config = get_guild_config(guild_id)
-    log_channel_id = config.get("logging_channel_id")
-    if not log_channel_id:
+    log_digest = getattr(client, "log_digest", None)
+    if log_digest is not None:
+        log_digest.enqueue(guild_id, message)
         return
 
-    log_channel = guild.get_channel(log_channel_id)
+    guild = client.get_guild(guild_id)
+    if not guild:
+        return
+
+    log_channel = guild.get_channel(config.get("logging_channel_id"))
     if not log_channel:
         return
     await log_channel.send(message)
@@ -27,17 +36,17 @@ async def assign_absence_role(interaction, add=True):
     guild = interaction.guild
     config = get_guild_config(guild.id)
     role_name = config.get("role_name", DEFAULT_ROLE_NAME)
-    role = get_role(guild, role_name)
+    role = get_absence_role(guild, config)
     member = await get_member(guild, interaction.user.id)
     if not role or not member or not await modify_role(member, role, add=add):
         action = tg(guild.id, "common.assign_verb") if add else tg(guild.id, "common.remove_verb")
-        logger.error(f"Failed to {action} role '{role_name}' for {interaction.user} in guild {guild.id}")
+        logger.error("Failed to %s role '%s' for %s in guild %s", action, role_name, interaction.user, guild.id)
         await interaction.response.send_message(
             tg(guild.id, "errors.role_modify", role=role_name, action=action),
             ephemeral=True
         )
         return False
-    logger.info(f"User {interaction.user} {'assigned' if add else 'removed'} role '{role_name}' in guild {guild.id}")
+    logger.info("User %s %s role '%s' in guild %s", interaction.user, 'assigned' if add else 'removed', role_name, guild.id)
     return True
 
 async def respond_absence_set(interaction, until_date):
@@ -70,76 +79,67 @@ class DateModalExtend(discord.ui.Modal):
         )
         self.add_item(self.date_input)
 
+    @track_interaction("extend_custom_submit")
     async def on_submit(self, interaction: discord.Interaction):
         valid_date = validate_date(self.date_input.value)
-        logger.info(f"User {interaction.user} attempts to extend absence to {self.date_input.value}")
+        logger.info("User %s attempts to extend absence to %s", interaction.user, self.date_input.value)
         if not valid_date:
-            await respond_invalid_date(interaction)
+            await interaction.response.send_message(tg(self.guild_id, "absence.invalid_date"), ephemeral=True)
             return
 
-        from config import load_data, save_data
-        data = load_data()
-        user_id = interaction.user.id
-
-        for entry in data:
-            if entry.get("user_id") == user_id and entry.get("guild_id") == self.guild_id:
-                entry["date"] = valid_date.strftime("%d.%m.%Y")
-                entry["notified"] = False
-                save_data(data)
-
-                await interaction.response.send_message(
-                    tg(interaction.guild.id, "absence.extend_ok", date=valid_date.strftime("%d.%m.%Y")),
-                    ephemeral=True
-                )
-
-                await log_absence_event_by_guild(
-                    interaction.client,
-                    self.guild_id,
-                    tg(self.guild_id, "log.absence_extended_until", user=interaction.user.mention,
-                       date=valid_date.strftime("%d.%m.%Y"))
-                )
-                return
+        date_str = format_date(valid_date)
+        async with entry_lock(self.guild_id, interaction.user.id):
+            updated = update_entry(interaction.user.id, self.guild_id, date=valid_date.isoformat(), notified=False)
+        if updated is None:
+            await interaction.response.send_message(
+                tg(self.guild_id, "absence.no_active_hint"),
+                ephemeral=True
+            )
+            return
 
         await interaction.response.send_message(
-            tg(interaction.guild.id, "absence.no_active_hint"),
+            tg(self.guild_id, "absence.extend_ok", date=date_str),
             ephemeral=True
         )
 
+        await log_absence_event_by_guild(
+            interaction.client,
+            self.guild_id,
+            tg(self.guild_id, "log.absence_extended_until", user=interaction.user.mention, date=date_str)
+        )
+
 async def _extend_absence(interaction: discord.Interaction, weeks: int, guild_id: int):
-    from config import load_data, save_data
-    data = load_data()
     user_id = interaction.user.id
-
-    for entry in data:
-        if entry.get("user_id") == user_id and entry.get("guild_id") == guild_id:
-            current_date = validate_date(entry["date"])
-            if not current_date:
-                await respond_invalid_date(interaction)
-                return
-
-            extended_date = current_date + timedelta(weeks=weeks)
-            extended_str = extended_date.strftime("%d.%m.%Y")
-            entry["date"] = extended_str
-            entry["notified"] = False
-            save_data(data)
-
+    async with entry_lock(guild_id, user_id):
+        entry = get_entry(user_id, guild_id)
+        if entry is None:
             await interaction.response.send_message(
-                tg(interaction.guild.id, "absence.extend_ok", date=extended_str),
+                tg(guild_id, "absence.no_active_hint"),
                 ephemeral=True
             )
+            return
 
-            await log_absence_event_by_guild(
-                interaction.client,
-                guild_id,
-                tg(guild_id, "log.absence_extended_by_days", user=interaction.user.mention, days=weeks * 7, date=extended_str)
-            )
+        current_date = parse_entry_date(entry)
+        if not current_date:
+            await interaction.response.send_message(tg(guild_id, "absence.invalid_date"), ephemeral=True)
             return
 
+        extended_date = max(current_date, date.today()) + timedelta(weeks=weeks)
+        update_entry(user_id, guild_id, date=extended_date.isoformat(), notified=False)
+
+    extended_str = format_date(extended_date)
+
     await interaction.response.send_message(
-        tg(interaction.guild.id, "absence.no_active_hint"),
+        tg(guild_id, "absence.extend_ok", date=extended_str),
         ephemeral=True
     )
 
+    await log_absence_event_by_guild(
+        interaction.client,
+        guild_id,
+        tg(guild_id, "log.absence_extended_by_days", user=interaction.user.mention, days=weeks * 7, date=extended_str)
+    )
+
 class ExtendAbsenceView(discord.ui.View):
     def __init__(self, guild_id: int):
         super().__init__(timeout=None)
@@ -150,14 +150,17 @@ class ExtendAbsenceView(discord.ui.View):
         self.extend_absence.label = tg(guild_id, "ui.btn_extend_custom")
 
     @discord.ui.button(label="+2 Wochen", style=discord.ButtonStyle.primary, emoji="⏱️", custom_id="extend_2w")
+    @track_interaction("extend_2w")
     async def set_2weeks(self, interaction: discord.Interaction, button: discord.ui.Button):
         await _extend_absence(interaction, weeks=2, guild_id=self.guild_id)
 
     @discord.ui.button(label="+4 Wochen", style=discord.ButtonStyle.primary, emoji="⏳", custom_id="extend_4w")
+    @track_interaction("extend_4w")
     async def set_4weeks(self, interaction: discord.Interaction, button: discord.ui.Button):
         await _extend_absence(interaction, weeks=4, guild_id=self.guild_id)
 
     @discord.ui.button(label="Individuelles Datum", style=discord.ButtonStyle.secondary, emoji="🗓️", custom_id="extend_custom")
+    @track_interaction("extend_custom")
     async def extend_absence(self, interaction: discord.Interaction, button: discord.ui.Button):
         await interaction.response.send_modal(DateModalExtend(guild_id=self.guild_id))
 
@@ -174,19 +177,20 @@ class DateModal(discord.ui.Modal):
         )
         self.add_item(self.date_input)
 
+    @track_interaction("absence_custom_submit")
     async def on_submit(self, interaction: discord.Interaction):
         valid_date = validate_date(self.date_input.value)
-        logger.info(f"User {interaction.user} sets absence date to {self.date_input.value}")
+        logger.info("User %s sets absence date to %s", interaction.user, self.date_input.value)
         if not valid_date:
             await respond_invalid_date(interaction)
             return
 
-        date_str = valid_date.strftime("%d.%m.%Y")
-        add_or_update_entry(interaction.user.id, str(interaction.user), date_str, interaction.guild.id)
-
-        if not await assign_absence_role(interaction, add=True):
-            remove_entry(interaction.user.id, interaction.guild.id)
-            return
+        date_str = format_date(valid_date)
+        async with entry_lock(interaction.guild.id, interaction.user.id):
+            add_or_update_entry(interaction.user.id, str(interaction.user), valid_date.isoformat(), interaction.guild.id)
+            if not await assign_absence_role(interaction, add=True):
+                remove_entry(interaction.user.id, interaction.guild.id)
+                return
 
         await respond_absence_set(interaction, date_str)
         await log_absence_event_by_guild(
@@ -196,12 +200,14 @@ class DateModal(discord.ui.Modal):
         )
 
 async def _set_absence(interaction: discord.Interaction, days: int):
-    target_date = (datetime.now() + timedelta(days=days)).strftime("%d.%m.%Y")
-    logger.info(f"User {interaction.user} sets absence for {days} days (until {target_date})")
-    add_or_update_entry(interaction.user.id, str(interaction.user), target_date, interaction.guild.id)
-    if not await assign_absence_role(interaction, add=True):
-        remove_entry(interaction.user.id, interaction.guild.id)
-        return
+    until = date.today() + timedelta(days=days)
+    target_date = format_date(until)
+    logger.info("User %s sets absence for %s days (until %s)", interaction.user, days, target_date)
+    async with entry_lock(interaction.guild.id, interaction.user.id):
+        add_or_update_entry(interaction.user.id, str(interaction.user), until.isoformat(), interaction.guild.id)
+        if not await assign_absence_role(interaction, add=True):
+            remove_entry(interaction.user.id, interaction.guild.id)
+            return
     await respond_absence_set(interaction, target_date)
     await log_absence_event_by_guild(
         interaction.client,
@@ -221,26 +227,31 @@ class AbwesenheitView(discord.ui.View):
             self.end_absence.label = tg(guild_id, "ui.btn_end")
 
     @discord.ui.button(label="2 Wochen", style=discord.ButtonStyle.primary, emoji="⏱️", row=0, custom_id="absence_2w")
+    @track_interaction("absence_2w")
     async def set_2weeks(self, interaction: discord.Interaction, button: discord.ui.Button):
         await _set_absence(interaction, days=14)
 
     @discord.ui.button(label="4 Wochen", style=discord.ButtonStyle.primary, emoji="⏳", row=0, custom_id="absence_4w")
+    @track_interaction("absence_4w")
     async def set_4weeks(self, interaction: discord.Interaction, button: discord.ui.Button):
         await _set_absence(interaction, days=28)
 
     @discord.ui.button(label="Individuelles Datum", style=discord.ButtonStyle.secondary, emoji="🗓️", row=1, custom_id="absence_custom")
+    @track_interaction("absence_custom")
     async def open_modal(self, interaction: discord.Interaction, button: discord.ui.Button):
         gid = self.guild_id or interaction.guild.id
         await interaction.response.send_modal(DateModal(guild_id=gid))
 
     @discord.ui.button(label="Abwesenheit beenden", style=discord.ButtonStyle.danger, emoji="✅", row=1, custom_id="absence_end")
+    @track_interaction("absence_end")
     async def end_absence(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if not remove_entry(interaction.user.id, interaction.guild.id):
-            await interaction.response.send_message(tg(interaction.guild.id, "absence.no_active"), ephemeral=True)
-            return
+        async with entry_lock(interaction.guild.id, interaction.user.id):
+            if not remove_entry(interaction.user.id, interaction.guild.id):
+                await interaction.response.send_message(tg(interaction.guild.id, "absence.no_active"), ephemeral=True)
+                return
 
-        if not await assign_absence_role(interaction, add=False):
-            return
+            if not await assign_absence_role(interaction, add=False):
+                return
 
         await respond_absence_end(interaction)
         await log_absence_event_by_guild(
@@ -257,4 +268,31 @@ def build_manager_embed(guild_id: int) -> discord.Embed:
     )
     embed.set_footer(text=tg(guild_id, "ui.manager_footer"))
     embed.set_thumbnail(url=ABSENCE_MANAGER_THUMB_URL)
-    return embed
\ No newline at end of file
+    return embed
+
+_manager_payload_cache: dict[tuple[int, str], tuple[discord.Embed, AbwesenheitView]] = {}
+_extend_view_cache: dict[tuple[int, str], ExtendAbsenceView] = {}
+
+def _ui_cache_key(guild_id: int) -> tuple[int, str]:
+    return guild_id, get_guild_config(guild_id).get("language", "de")
+
+def get_manager_payload(guild_id: int) -> tuple[discord.Embed, AbwesenheitView]:
+    key = _ui_cache_key(guild_id)
+    payload = _manager_payload_cache.get(key)
+    if payload is None:
+        payload = (build_manager_embed(guild_id), AbwesenheitView(guild_id=guild_id))
+        _manager_payload_cache[key] = payload
+    return payload
+
+def get_extend_view(guild_id: int) -> ExtendAbsenceView:
+    key = _ui_cache_key(guild_id)
+    view = _extend_view_cache.get(key)
+    if view is None:
+        view = ExtendAbsenceView(guild_id)
+        _extend_view_cache[key] = view
+    return view
+
+def invalidate_ui_cache(guild_id: int):
+    for cache in (_manager_payload_cache, _extend_view_cache):
+        for key in [key for key in cache if key[0] == guild_id]:
+            del cache[key]
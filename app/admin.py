@@ -1,26 +1,69 @@
+import asyncio, time as time_module
 import discord
-from datetime import datetime
+from datetime import datetime, time
 from discord import app_commands
 from discord.app_commands import locale_str
 
-from absence import AbwesenheitView, build_manager_embed
+from absence import get_manager_payload, invalidate_ui_cache
 from localization import SUPPORTED_LANGUAGES, tg
-from config import update_guild_config, get_guild_config, DEFAULT_ROLE_NAME, load_data, ABSENCE_MANAGER_THUMB_URL
+from log_digest import WEBHOOK_NAME
+from dates import format_date
+from metrics import counter_value, gauge_value, histogram_summary
+from profiling import CHECK_DATES, INTERACTIONS, profiler
+from sharding import shard_stats
+from config import (
+    update_guild_config, get_guild_config, invalidate_role_cache, DEFAULT_ROLE_NAME, get_guild_entries,
+    ensure_single_embed, is_panel_message, remember_panel_message, parse_entry_date, pending_storage_writes
+)
 
+EMBED_FIELD_LIMIT = 1024
 
-async def _delete_absence_embeds(channel: discord.TextChannel, bot: discord.Client):
-    def is_absence_embed(message: discord.Message):
-        if message.author != bot.user or not message.embeds:
-            return False
-        emb = message.embeds[0]
-        thumb_url = emb.thumbnail.url if emb.thumbnail else None
-        return thumb_url == ABSENCE_MANAGER_THUMB_URL
 
+async def _delete_absence_embeds(channel: discord.TextChannel, bot: discord.Client):
     async for msg in channel.history(limit=500):
-        if is_absence_embed(msg):
+        if is_panel_message(msg, bot):
             await msg.delete()
 
 
+async def _delete_panel_message(channel: discord.TextChannel, bot: discord.Client):
+    cfg = get_guild_config(channel.guild.id)
+    message_id = cfg.get("panel_message_id")
+    if not message_id or cfg.get("panel_channel_id") != channel.id:
+        await _delete_absence_embeds(channel, bot)
+        return
+    try:
+        await channel.get_partial_message(message_id).delete()
+    except discord.NotFound:
+        pass
+
+
+async def _log_webhook_url(channel: discord.TextChannel) -> str:
+    for webhook in await channel.webhooks():
+        if webhook.name == WEBHOOK_NAME and webhook.token:
+            return webhook.url
+    webhook = await channel.create_webhook(name=WEBHOOK_NAME)
+    return webhook.url
+
+
+async def _delete_log_webhook(webhook_url: str, bot: discord.Client):
+    try:
+        await discord.Webhook.from_url(webhook_url, client=bot).delete()
+    except (discord.HTTPException, ValueError):
+        pass
+
+
+def _field_lines(guild_id, lines, limit=EMBED_FIELD_LIMIT) -> str:
+    shown = []
+    for index, line in enumerate(lines):
+        rest = len(lines) - index - 1
+        tail = [tg(guild_id, "admin.stats_more", count=rest)] if rest else []
+        if len("\n".join([*shown, line, *tail])) > limit:
+            shown.append(tg(guild_id, "admin.stats_more", count=rest + 1))
+            break
+        shown.append(line)
+    return "\n".join(shown)
+
+
 async def _refresh_manager_message(guild: discord.Guild, bot: discord.Client) -> bool:
     cfg = get_guild_config(guild.id)
     channel_id = cfg.get("channel_id")
@@ -32,8 +75,8 @@ async def _refresh_manager_message(guild: discord.Guild, bot: discord.Client) ->
         return False
 
     try:
-        await _delete_absence_embeds(channel, bot)
-        await channel.send(embed=build_manager_embed(guild.id), view=AbwesenheitView(guild_id=guild.id))
+        embed, view = get_manager_payload(guild.id)
+        await ensure_single_embed(channel, bot, embed, view, force_edit=True)
         return True
     except discord.Forbidden:
         return False
@@ -60,14 +103,16 @@ def register_admin_commands(bot):
             old_channel = interaction.guild.get_channel(old_channel_id)
             if isinstance(old_channel, discord.TextChannel) and old_channel != channel:
                 try:
-                    await _delete_absence_embeds(old_channel, interaction.client)
+                    await _delete_panel_message(old_channel, interaction.client)
                 except discord.Forbidden:
                     pass
 
         update_guild_config(guild_id, channel_id=channel.id)
+        invalidate_ui_cache(guild_id)
 
         try:
-            await channel.send(embed=build_manager_embed(guild_id), view=AbwesenheitView(guild_id=guild_id))
+            embed, view = get_manager_payload(guild_id)
+            remember_panel_message(await channel.send(embed=embed, view=view))
         except Exception:
             await interaction.followup.send(
                 tg(guild_id, "errors.send_absence_manager_failed", channel=channel.mention),
@@ -83,7 +128,8 @@ def register_admin_commands(bot):
     @bot.tree.command(name="set_role", description=locale_str("cmd.set_role.desc"))
     @app_commands.checks.has_permissions(administrator=True)
     async def set_role(interaction: discord.Interaction, role: discord.Role):
-        update_guild_config(interaction.guild.id, role_name=role.name)
+        update_guild_config(interaction.guild.id, role_id=role.id, role_name=role.name)
+        invalidate_role_cache(interaction.guild.id)
         await interaction.response.send_message(
             tg(interaction.guild.id, "admin.role_set", role=role.name),
             ephemeral=True
@@ -91,12 +137,26 @@ def register_admin_commands(bot):
 
     @bot.tree.command(name="set_logging_channel", description=locale_str("cmd.set_logging_channel.desc"))
     @app_commands.checks.has_permissions(administrator=True)
-    async def set_logging_channel(interaction: discord.Interaction, channel: discord.TextChannel):
-        update_guild_config(interaction.guild.id, logging_channel_id=channel.id)
+    @app_commands.describe(use_webhook=locale_str("cmd.set_logging_channel.use_webhook"))
+    async def set_logging_channel(interaction: discord.Interaction, channel: discord.TextChannel, use_webhook: bool = False):
+        old_webhook_url = get_guild_config(interaction.guild.id).get("logging_webhook_url")
+        webhook_url = ""
+        if use_webhook:
+            try:
+                webhook_url = await _log_webhook_url(channel)
+            except discord.HTTPException:
+                await interaction.response.send_message(
+                    tg(interaction.guild.id, "errors.webhook_create_failed", channel=channel.mention),
+                    ephemeral=True
+                )
+                return
+        update_guild_config(interaction.guild.id, logging_channel_id=channel.id, logging_webhook_url=webhook_url)
         await interaction.response.send_message(
             tg(interaction.guild.id, "admin.logging_channel_set", channel=channel.mention),
             ephemeral=True
         )
+        if old_webhook_url and old_webhook_url != webhook_url:
+            await _delete_log_webhook(old_webhook_url, interaction.client)
 
     @bot.tree.command(name="show_config", description=locale_str("cmd.show_config.desc"))
     @app_commands.checks.has_permissions(administrator=True)
@@ -133,8 +193,7 @@ def register_admin_commands(bot):
     @app_commands.checks.has_permissions(administrator=True)
     async def show_absent_users(interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
-        data = load_data()
-        guild_data = [entry for entry in data if entry.get("guild_id") == interaction.guild.id]
+        guild_data = get_guild_entries(interaction.guild.id)
 
         if not guild_data:
             await interaction.followup.send(tg(interaction.guild.id, "admin.absent_users_none"), ephemeral=True)
@@ -151,19 +210,18 @@ def register_admin_commands(bot):
             if not member:
                 continue
 
-            return_date_str = entry.get("date", "")
-            try:
-                return_date = datetime.strptime(return_date_str, "%d.%m.%Y")
-                relative = discord.utils.format_dt(return_date, style='R')
+            return_date = parse_entry_date(entry)
+            if return_date is not None:
+                relative = discord.utils.format_dt(datetime.combine(return_date, time.min), style='R')
                 embed.add_field(
                     name=member.display_name,
-                    value=tg(interaction.guild.id, "admin.absent_users_entry", date=return_date_str, relative=relative),
+                    value=tg(interaction.guild.id, "admin.absent_users_entry", date=format_date(return_date), relative=relative),
                     inline=False
                 )
-            except Exception:
+            else:
                 embed.add_field(
                     name=member.display_name,
-                    value=tg(interaction.guild.id, "admin.absent_users_invalid_date", date=return_date_str),
+                    value=tg(interaction.guild.id, "admin.absent_users_invalid_date", date=entry.get("date", "")),
                     inline=False
                 )
 
@@ -181,6 +239,7 @@ def register_admin_commands(bot):
     async def set_language(interaction: discord.Interaction, language: app_commands.Choice[str]):
         await interaction.response.defer(ephemeral=True)
         update_guild_config(interaction.guild.id, language=language.value)
+        invalidate_ui_cache(interaction.guild.id)
 
         refreshed = await _refresh_manager_message(interaction.guild, interaction.client)
 
@@ -193,3 +252,134 @@ def register_admin_commands(bot):
             msg += "\n" + tg(interaction.guild.id, "admin.language_set_no_channel")
 
         await interaction.followup.send(msg, ephemeral=True)
+
+    @bot.tree.command(name="stats", description=locale_str("cmd.stats.desc"))
+    @app_commands.checks.has_permissions(administrator=True)
+    async def stats(interaction: discord.Interaction):
+        guild_id = interaction.guild.id
+        client = interaction.client
+        embed = discord.Embed(title=tg(guild_id, "admin.stats_title"), color=0x3498db)
+
+        last = getattr(client, "last_reconcile_stats", None)
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_reconcile"),
+            value=tg(
+                guild_id,
+                "admin.stats_reconcile_value",
+                duration=f"{last['duration']:.3f}",
+                entries=last["entries"],
+                removed=last["removed"],
+                notified=last["notified"],
+            ) if last else tg(guild_id, "admin.stats_never"),
+            inline=False
+        )
+
+        storage = [
+            f"{kind} {target}: {count}× / {total / count * 1000:.1f} ms"
+            for kind in ("load", "save")
+            for target, (count, total) in sorted(histogram_summary(f"storage_{kind}_seconds").items())
+        ]
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_storage"),
+            value="\n".join(storage) or tg(guild_id, "admin.stats_never"),
+            inline=False
+        )
+
+        lag = gauge_value("event_loop_lag_max_seconds")
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_loop"),
+            value=tg(
+                guild_id,
+                "admin.stats_loop_value",
+                lag=f"{lag * 1000:.1f}" if lag is not None else "–",
+                pending=pending_storage_writes(),
+            ),
+            inline=False
+        )
+
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_rest"),
+            value=tg(
+                guild_id,
+                "admin.stats_rest_value",
+                requests=int(counter_value("rest_requests_total")),
+                errors=int(counter_value("errors_total")),
+            ),
+            inline=False
+        )
+
+        interactions = [
+            f"`{custom_id}`: {count}× / {total / count * 1000:.0f} ms"
+            for custom_id, (count, total) in sorted(histogram_summary("interaction_seconds").items())
+        ]
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_interactions"),
+            value="\n".join(interactions) or tg(guild_id, "admin.stats_never"),
+            inline=False
+        )
+
+        shards = [
+            tg(
+                guild_id,
+                "admin.stats_shard",
+                shard=shard_id,
+                latency=f"{info['latency'] * 1000:.0f}" if info["latency"] is not None else "–",
+                guilds=info["guilds"],
+            )
+            for shard_id, info in shard_stats(client).items()
+        ]
+        embed.add_field(
+            name=tg(guild_id, "admin.stats_gateway"),
+            value=_field_lines(guild_id, shards) or "–",
+            inline=False
+        )
+
+        if getattr(client, "cluster_state", None) is not None:
+            from cluster import read_cluster_state
+            workers = [
+                tg(
+                    guild_id,
+                    "admin.stats_worker",
+                    worker=worker_id,
+                    shards=len(snapshot["shards"]),
+                    guilds=snapshot["guilds"],
+                    age=int(time_module.time() - snapshot["updated"]),
+                )
+                for worker_id, snapshot in sorted((await read_cluster_state(client.cluster_state)).items())
+            ]
+            embed.add_field(
+                name=tg(guild_id, "admin.stats_cluster"),
+                value=_field_lines(guild_id, workers) or tg(guild_id, "admin.stats_never"),
+                inline=False
+            )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @bot.tree.command(name="profile", description=locale_str("cmd.profile.desc"))
+    @app_commands.describe(count=locale_str("cmd.profile.count"))
+    @app_commands.choices(target=[
+        app_commands.Choice(name="check_dates", value=CHECK_DATES),
+        app_commands.Choice(name="interactions", value=INTERACTIONS),
+    ])
+    async def profile(interaction: discord.Interaction, target: app_commands.Choice[str], count: app_commands.Range[int, 1, 500] = 1):
+        guild_id = interaction.guild.id if interaction.guild else None
+        client = interaction.client
+        if not await client.is_owner(interaction.user):
+            await interaction.response.send_message(tg(guild_id, "admin.profile_owner_only"), ephemeral=True)
+            return
+
+        user = interaction.user
+
+        async def deliver(path, summary):
+            text = tg(guild_id, "admin.profile_done", target=target.value, count=count, path=path)
+            await user.send(f"{text}\n```\n{summary[:1700]}\n```")
+
+        if not profiler.arm(target.value, count, on_done=deliver):
+            await interaction.response.send_message(tg(guild_id, "admin.profile_busy"), ephemeral=True)
+            return
+
+        await interaction.response.send_message(
+            tg(guild_id, "admin.profile_armed", target=target.value, count=count),
+            ephemeral=True
+        )
+        if target.value == CHECK_DATES and hasattr(client, "check_dates_loop"):
+            client.profile_sweep_task = asyncio.create_task(client.check_dates_loop())
@@ -1,4 +1,4 @@
-import os
+import asyncio, os, signal, sys
 from discord.ext import commands
 
 from admin import register_admin_commands
@@ -6,6 +6,12 @@ from absence import *
 from tasks import register_tasks
 from events import register_events
 from logger import logger
+from config import flush_storage, preload_storage
+from log_digest import LogDigest
+from dm_queue import DMQueue
+from metrics import instrument_http, monitor_loop_lag, start_metrics_server
+from profiling import install_signal_handler
+from sharding import SHARD_COUNT, SHARD_IDS
 
 PRODUCTION = True
 
@@ -15,19 +21,63 @@ intents.members         = True
 intents.message_content = True
 intents.messages        = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class CiaorellaBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        instrument_http(self.http)
+        await preload_storage()
+        self.loop_lag_task = asyncio.create_task(monitor_loop_lag())
+        self.metrics_server = await start_metrics_server()
+        if self.cluster_state is not None:
+            from cluster import publish_worker_stats
+            self.cluster_task = asyncio.create_task(publish_worker_stats(self, self.cluster_state))
+        try:
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGTERM, self.handle_sigterm)
+            install_signal_handler(loop)
+        except NotImplementedError:
+            logger.info("Signal handlers are not supported on this platform, SIGTERM shutdown and SIGUSR1 profiling disabled.")
+
+    def handle_sigterm(self):
+        logger.info("SIGTERM received, shutting down...")
+        self.shutdown_task = asyncio.create_task(self.close())
+
+    async def close(self):
+        if getattr(self, "loop_lag_task", None) is not None:
+            self.loop_lag_task.cancel()
+        if getattr(self, "cluster_task", None) is not None:
+            self.cluster_task.cancel()
+        if getattr(self, "metrics_server", None) is not None:
+            self.metrics_server.close()
+        await self.dm_queue.stop()
+        await self.log_digest.flush_all()
+        await super().close()
+
+bot = CiaorellaBot(command_prefix="!", intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+bot.log_digest = LogDigest(bot)
+bot.dm_queue = DMQueue(bot)
+bot.force_sync = "--force-sync" in sys.argv
+bot.cluster_state = None
 
 register_admin_commands(bot)
 register_tasks(bot)
 register_events(bot)
 
-if __name__ == "__main__":
+def load_token():
     if PRODUCTION:
         token = os.environ.get("DISCORD_TOKEN")
         if not token:
             raise RuntimeError("No DISCORD_TOKEN set in environment variables.")
-    else:
-        with open("token.txt", "r") as f:
-            token = f.read().strip()
+        return token
+    with open("token.txt", "r") as f:
+        return f.read().strip()
+
+def main():
+    token = load_token()
     logger.info("Starting bot...")
-    bot.run(token)
+    try:
+        bot.run(token)
+    finally:
+        flush_storage()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import argparse, asyncio, json, multiprocessing, os, re, signal, time, urllib.request
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CLUSTER_WORKERS = int(os.environ.get("CLUSTER_WORKERS", str(os.cpu_count() or 1)))
+PUBLISH_INTERVAL = float(os.environ.get("CLUSTER_PUBLISH_INTERVAL", "15"))
+RESTART_DELAY = 10.0
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+_HISTOGRAM_SUFFIXES = ("_bucket", "_sum", "_count")
+_SAMPLE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{.*\})? (.*)$")
+
+
+def shard_ranges(shard_count, workers):
+    workers = max(1, min(workers, shard_count))
+    per_worker, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for worker_id in range(workers):
+        size = per_worker + (1 if worker_id < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+def recommended_shard_count(token):
+    request = urllib.request.Request(GATEWAY_URL, headers={"Authorization": f"Bot {token}", "User-Agent": "CiaorellaBot"})
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.load(response)["shards"]
+
+
+def _worker_main(worker_id, shard_ids, shard_count, shared):
+    os.environ["CLUSTER_WORKER_ID"] = str(worker_id)
+    os.environ["SHARD_COUNT"] = str(shard_count)
+    os.environ["SHARD_IDS"] = ",".join(map(str, shard_ids))
+    os.environ["STORAGE_BACKEND"] = "sqlite"
+    os.environ["METRICS_PORT"] = "0"
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    import bot as bot_module
+    bot_module.bot.cluster_state = shared
+    bot_module.main()
+
+
+def worker_snapshot(bot):
+    from metrics import render
+    from sharding import WORKER_ID, shard_stats
+    return {
+        "worker": WORKER_ID,
+        "pid": os.getpid(),
+        "updated": time.time(),
+        "shards": {str(shard_id): info for shard_id, info in shard_stats(bot).items()},
+        "guilds": len(bot.guilds),
+        "last_reconcile": getattr(bot, "last_reconcile_stats", None),
+        "metrics": render(),
+    }
+
+
+async def publish_worker_stats(bot, shared):
+    from sharding import WORKER_ID
+    while True:
+        try:
+            snapshot = worker_snapshot(bot)
+            await asyncio.to_thread(shared.__setitem__, WORKER_ID, snapshot)
+        except Exception as e:
+            logger.warning("Publishing cluster stats of worker %s failed: %s", WORKER_ID, e)
+        await asyncio.sleep(PUBLISH_INTERVAL)
+
+
+async def read_cluster_state(shared):
+    return await asyncio.to_thread(lambda: dict(shared.items()))
+
+
+def _with_worker_label(line, worker_id):
+    match = _SAMPLE.match(line)
+    if match is None:
+        return line
+    name, labels, value = match.groups()
+    labels = labels[1:-1] + "," if labels else ""
+    return f'{name}{{{labels}worker="{worker_id}"}} {value}'
+
+
+def _family(name, families):
+    for suffix in _HISTOGRAM_SUFFIXES:
+        if name.endswith(suffix) and name[:-len(suffix)] in families:
+            return name[:-len(suffix)]
+    return name
+
+
+def merge_metrics(snapshots):
+    families = {}
+    for worker_id, snapshot in sorted(snapshots.items()):
+        for line in snapshot.get("metrics", "").splitlines():
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                if len(parts) >= 3:
+                    families.setdefault(parts[2], ({}, []))[0].setdefault(line, None)
+            elif line and not line.startswith("#"):
+                match = _SAMPLE.match(line)
+                name = _family(match.group(1), families) if match else line
+                families.setdefault(name, ({}, []))[1].append(_with_worker_label(line, worker_id))
+    lines = []
+    for headers, samples in families.values():
+        lines.extend(headers)
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+class Cluster:
+    def __init__(self, workers, shard_count):
+        self.shard_count = shard_count
+        self.ranges = shard_ranges(shard_count, workers)
+        self.context = multiprocessing.get_context("spawn")
+        self.manager = self.context.Manager()
+        self.shared = self.manager.dict()
+        self.processes = {}
+        self.stopping = False
+
+    def _spawn(self, worker_id):
+        shard_ids = self.ranges[worker_id]
+        process = self.context.Process(
+            target=_worker_main,
+            args=(worker_id, shard_ids, self.shard_count, self.shared),
+            name=f"ciaorella-worker-{worker_id}",
+        )
+        process.start()
+        self.processes[worker_id] = process
+        logger.info("Started worker %s (pid %s) with shards %s-%s.", worker_id, process.pid, shard_ids[0], shard_ids[-1])
+
+    async def _render(self):
+        return merge_metrics(await read_cluster_state(self.shared))
+
+    async def run(self):
+        from metrics import start_metrics_server
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+
+        server = await start_metrics_server(render_func=self._render)
+        for worker_id in range(len(self.ranges)):
+            self._spawn(worker_id)
+
+        while not self.stopping:
+            await asyncio.sleep(RESTART_DELAY)
+            for worker_id, process in list(self.processes.items()):
+                if not process.is_alive() and not self.stopping:
+                    logger.warning("Worker %s exited with code %s, restarting.", worker_id, process.exitcode)
+                    self.shared.pop(worker_id, None)
+                    self._spawn(worker_id)
+
+        if server is not None:
+            server.close()
+        await asyncio.to_thread(self._join)
+        self.manager.shutdown()
+
+    def stop(self):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("Stopping %s cluster workers, waiting for them to flush storage...", len(self.processes))
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    def _join(self):
+        for process in self.processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Ciaorella as a cluster of sharded worker processes.")
+    parser.add_argument("--workers", type=int, default=CLUSTER_WORKERS)
+    parser.add_argument("--shards", type=int, default=None, help="Total shard count (default: SHARD_COUNT or Discord's recommendation).")
+    args = parser.parse_args()
+
+    from config import CONFIG_FILE, DATA_FILE, DB_FILE, STORAGE_BACKEND
+    from storage import open_storage
+    if STORAGE_BACKEND != "sqlite":
+        logger.info("Cluster workers share storage, using the SQLite backend instead of %s.", STORAGE_BACKEND)
+    open_storage("sqlite", DATA_FILE, CONFIG_FILE, DB_FILE).close()
+
+    shard_count = args.shards or (int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None)
+    if shard_count is None:
+        token = os.environ.get("DISCORD_TOKEN")
+        if not token:
+            raise SystemExit("Set --shards, SHARD_COUNT or DISCORD_TOKEN to determine the shard count.")
+        shard_count = recommended_shard_count(token)
+    cluster = Cluster(args.workers, shard_count)
+    logger.info("Launching %s workers for %s shards.", len(cluster.ranges), shard_count)
+    asyncio.run(cluster.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import hashlib, json, os
+
 import discord
 from discord import app_commands
 from discord.app_commands import locale_str
 
-from localization import t
+from config import COMMAND_HASH_FILE
+from localization import LOCALES, t
+from storage import atomic_write
 
 
 class TableTranslator(app_commands.Translator):
@@ -25,3 +29,24 @@ class TableTranslator(app_commands.Translator):
             lang = "de"
 
         return t(lang, key)
+
+
+def command_tree_hash(tree: app_commands.CommandTree) -> str:
+    payload = {
+        "application_id": tree.client.application_id,
+        "commands": sorted((cmd.to_dict(tree) for cmd in tree.get_commands()), key=lambda cmd: cmd["name"]),
+        "translations": {lang: texts.get("cmd", {}) for lang, texts in LOCALES.items()},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def load_synced_hash() -> str | None:
+    if not os.path.isfile(COMMAND_HASH_FILE):
+        return None
+    with open(COMMAND_HASH_FILE, "r", encoding="utf-8") as f:
+        return f.read().strip() or None
+
+
+def save_synced_hash(tree_hash: str):
+    atomic_write(COMMAND_HASH_FILE, tree_hash)
@@ -1,171 +1,602 @@
-import json, os, re
-from datetime import datetime
-from logger import logger
+import asyncio, atexit, os, time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import date
+from logger import get_logger
+from storage import StorageWorker, atomic_write, open_storage
+from metrics import set_counter, timer
+from dates import parse_date, to_iso
+from sharding import WORKER_ID, in_partition, is_partitioned
+
+logger = get_logger(__name__)
 
 DATA_FILE = "config/dates.json"
 CONFIG_FILE = "config/guild_config.json"
+DB_FILE = "config/ciaorella.db"
+COMMAND_HASH_FILE = "config/command_tree.sha256"
+DM_UNDELIVERABLE_FILE = f"config/dm_undeliverable-{WORKER_ID}.json" if is_partitioned() else "config/dm_undeliverable.json"
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "json")
+CONFIG_CHECK_INTERVAL = float(os.environ.get("CONFIG_CHECK_INTERVAL", "1.0"))
+MEMBER_CACHE_TTL = 600
+MEMBER_QUERY_BATCH = 100
 DEFAULT_ROLE_NAME = "Abwesend"
+SECRET_CONFIG_KEYS = ("logging_webhook_url",)
 ABSENCE_MANAGER_THUMB_URL = "https://pbs.twimg.com/media/DtFE2_BX4AECJ8a.jpg:large"
 
-DATE_PATTERN = re.compile(
-    r"^(?:31\.(?:0[13578]|1[02])\.\d{4}|"
-    r"(?:29|30\.(?:0[1,3-9]|1[0-2])\.\d{4})|"
-    r"(?:0[1-9]|1\d|2[0-8])\.(?:0[1-9]|1[0-2])\.\d{4}|"
-    r"29\.02\.(?:[02468][048]00|[13579][26]00|\d{2}[048]|\d{2}[13579][26]))$"
-)
+_storage = None
+_storage_worker = StorageWorker()
+_config_cache = None
+_config_version = None
+_config_checked_at = 0.0
+_config_writes = 0
+_config_refresh = None
+CONFIG_CACHE_STATS = {"hits": 0, "misses": 0}
+set_counter("config_cache_total", lambda: CONFIG_CACHE_STATS["hits"], result="hit")
+set_counter("config_cache_total", lambda: CONFIG_CACHE_STATS["misses"], result="miss")
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = open_storage(STORAGE_BACKEND, DATA_FILE, CONFIG_FILE, DB_FILE)
+    return _storage
+
+def run_storage(func, *args):
+    return _storage_worker.run(func, *args)
+
+def _write_in_background(target, func, *args):
+    def write():
+        with timer("storage_save_seconds", target=target):
+            func(*args)
+    return _storage_worker.submit(write)
+
+def _save_in_background(target, func, *args):
+    if get_storage().write_behind:
+        return _storage_worker.submit(func, *args)
+    return _write_in_background(target, func, *args)
+
+def write_file_in_background(target, path, text):
+    return _write_in_background(target, atomic_write, path, text)
+
+def pending_storage_writes():
+    return _storage_worker.pending
+
+def flush_storage():
+    _storage_worker.drain()
+    if _storage is not None:
+        _storage.flush()
+        logger.info("Flushed pending storage writes.")
+
+atexit.register(flush_storage)
+
+def _load_config_from_storage(storage):
+    with timer("storage_load_seconds", target="config"):
+        return storage.load_guild_configs()
+
+def _fetch_config_if_changed(storage, known_version):
+    version = storage.config_version()
+    if known_version is not None and version == known_version:
+        return version, None
+    return version, _load_config_from_storage(storage)
+
+def _install_config(version, config, writes):
+    global _config_cache, _config_version
+    if config is None or writes != _config_writes:
+        return
+    CONFIG_CACHE_STATS["misses"] += 1
+    logger.debug("Guild config changed (version %s), reloaded.", version)
+    _config_cache = config
+    _config_version = version
+
+async def _refresh_config():
+    writes = _config_writes
+    try:
+        version, config = await run_storage(_fetch_config_if_changed, get_storage(), _config_version)
+    except Exception as e:
+        logger.error("Refreshing guild config failed: %s", e, exc_info=True)
+        return
+    _install_config(version, config, writes)
+
+def _schedule_config_refresh():
+    global _config_refresh
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _install_config(*_fetch_config_if_changed(get_storage(), _config_version), _config_writes)
+        return
+    if _config_refresh is None or _config_refresh.done():
+        _config_refresh = loop.create_task(_refresh_config())
 
 def load_config():
-    logger.info("Loading config file...")
-    if os.path.isfile(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-                logger.debug("Config file loaded.")
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.error("Config JSON decode error.")
-            return {}
-    logger.warning("Config file not found, using defaults.")
-    return {}
+    global _config_checked_at
+    if _config_cache is None:
+        _install_config(*_fetch_config_if_changed(get_storage(), None), _config_writes)
+        _config_checked_at = time.monotonic()
+        return _config_cache
+    CONFIG_CACHE_STATS["hits"] += 1
+    now = time.monotonic()
+    if now - _config_checked_at >= CONFIG_CHECK_INTERVAL:
+        _config_checked_at = now
+        _schedule_config_refresh()
+    return _config_cache
+
+async def preload_storage():
+    global _config_checked_at
+    storage = await run_storage(get_storage)
+    _install_config(*await run_storage(_fetch_config_if_changed, storage, None), _config_writes)
+    _config_checked_at = time.monotonic()
+    await absences.reload_async()
+
+def invalidate_config_cache():
+    global _config_cache, _config_version
+    _config_cache = None
+    _config_version = None
 
 def save_config(config):
-    logger.info("Saving config file.")
-    os.makedirs(os.path.dirname(CONFIG_FILE), exist_ok=True)
-    with open(CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump(config, f, ensure_ascii=False, indent=4)
+    global _config_cache, _config_writes
+    _config_writes += 1
+    snapshot = {str(gid): dict(cfg) for gid, cfg in config.items()}
+    _save_in_background("config", get_storage().replace_guild_configs, snapshot)
+    _config_cache = config
 
-def get_guild_config(guild_id):
-    config = load_config()
-    return config.get(str(guild_id), {
+def _default_guild_config():
+    return {
         "channel_id": None,
         "role_name": DEFAULT_ROLE_NAME,
         "logging_channel_id": None,
-        "language": "de"
-    })
+        "language": "de",
+    }
+
+def _redacted(cfg):
+    return {key: "<redacted>" if key in SECRET_CONFIG_KEYS and value else value for key, value in cfg.items()}
+
+def get_guild_config(guild_id):
+    config = load_config()
+    return config.get(str(guild_id), _default_guild_config())
+
 def update_guild_config(guild_id, **kwargs):
+    global _config_writes
     config = load_config()
+    _config_writes += 1
     guild_id = str(guild_id)
     if guild_id not in config:
-        config[guild_id] = {
-            "channel_id": None,
-            "role_name": DEFAULT_ROLE_NAME,
-            "logging_channel_id": None,
-            "language": "de",
-        }
+        config[guild_id] = _default_guild_config()
     for key, value in kwargs.items():
         if value is not None:
             config[guild_id][key] = value
-    save_config(config)
-    logger.info(f"Updated guild config for {guild_id}: {config[guild_id]}")
+    _save_in_background("config", get_storage().save_guild_config, guild_id, dict(config[guild_id]))
+    logger.info("Updated guild config for %s: %s", guild_id, _redacted(config[guild_id]))
     return config[guild_id]
 
-def load_data():
-    logger.info("Loading absence data...")
-    if os.path.isfile(DATA_FILE):
+_entry_listeners = []
+
+def add_entry_listener(listener):
+    _entry_listeners.append(listener)
+
+def _notify_entry_listeners(key, entry):
+    for listener in _entry_listeners:
         try:
-            with open(DATA_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            logger.error("Absence data JSON decode error.")
-    return []
+            listener(key, entry)
+        except Exception as e:
+            logger.error("Absence entry listener failed for %s: %s", key, e, exc_info=True)
+
+class AbsenceRepository:
+    def __init__(self):
+        self._entries = {}
+        self._by_guild = {}
+        self._dirty = {}
+        self._versions = {}
+        self._clock = 0
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.reload()
+
+    def _index(self, data):
+        self._entries = {}
+        self._by_guild = {}
+        self._versions = {}
+        for entry in data:
+            self._put(entry)
+
+    def _put(self, entry):
+        key = (entry.get("guild_id"), entry.get("user_id"))
+        self._entries[key] = entry
+        self._by_guild.setdefault(key[0], {})[key[1]] = entry
+        self._clock += 1
+        self._versions[key] = self._clock
+        return key
+
+    def version(self, guild_id, user_id):
+        self._ensure_loaded()
+        return self._versions.get((guild_id, user_id))
+
+    def _conflicts(self, key, expected_version):
+        return expected_version is not None and self._versions.get(key) != expected_version
+
+    def get(self, guild_id, user_id):
+        self._ensure_loaded()
+        return self._entries.get((guild_id, user_id))
+
+    def for_guild(self, guild_id):
+        self._ensure_loaded()
+        return list(self._by_guild.get(guild_id, {}).values())
+
+    def all(self):
+        self._ensure_loaded()
+        return list(self._entries.values())
+
+    def upsert(self, entry, persist=True, expected_version=None):
+        self._ensure_loaded()
+        if self._conflicts((entry.get("guild_id"), entry.get("user_id")), expected_version):
+            return None
+        key = self._put(entry)
+        self._dirty[key] = entry
+        _notify_entry_listeners(key, entry)
+        if persist:
+            self.persist()
+        return entry
+
+    def annotate(self, guild_id, user_id, persist=True, **fields):
+        self._ensure_loaded()
+        key = (guild_id, user_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        entry.update(fields)
+        self._dirty[key] = entry
+        if persist:
+            self.persist()
+        return entry
+
+    def remove(self, guild_id, user_id, persist=True, expected_version=None):
+        self._ensure_loaded()
+        key = (guild_id, user_id)
+        if self._conflicts(key, expected_version):
+            return None
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return None
+        self._versions.pop(key, None)
+        guild_entries = self._by_guild.get(guild_id)
+        if guild_entries is not None:
+            guild_entries.pop(user_id, None)
+            if not guild_entries:
+                del self._by_guild[guild_id]
+        self._dirty[key] = None
+        _notify_entry_listeners(key, None)
+        if persist:
+            self.persist()
+        return entry
+
+    def replace_all(self, data):
+        partitioned = is_partitioned()
+        if partitioned:
+            self._ensure_loaded()
+            data = [entry for entry in data if in_partition(entry.get("guild_id"))]
+        old_keys = set(self._entries)
+        for entry in data:
+            _normalize_entry_date(entry)
+        self._index(data)
+        self._dirty = {}
+        self._loaded = True
+        snapshot = [dict(entry) for entry in self._entries.values()]
+        if partitioned:
+            _save_in_background("absences", get_storage().apply_absence_changes, snapshot, list(old_keys - set(self._entries)))
+        else:
+            _save_in_background("absences", get_storage().replace_absences, snapshot)
+        for key in old_keys - set(self._entries):
+            _notify_entry_listeners(key, None)
+        for key, entry in self._entries.items():
+            _notify_entry_listeners(key, entry)
+
+    def _fetch(self):
+        with timer("storage_load_seconds", target="absences"):
+            entries = get_storage().load_absences()
+        if is_partitioned():
+            entries = [entry for entry in entries if in_partition(entry.get("guild_id"))]
+        return entries
+
+    def reload(self):
+        self._install(self._fetch())
+
+    async def reload_async(self):
+        self._install(await run_storage(self._fetch))
+
+    def _install(self, entries):
+        self._index(entries)
+        self._dirty = {}
+        self._loaded = True
+        migrated = [entry for entry in entries if _normalize_entry_date(entry)]
+        if migrated:
+            for entry in migrated:
+                self._dirty[(entry.get("guild_id"), entry.get("user_id"))] = entry
+            self.persist()
+            logger.info("Migrated %s absence dates to ISO format.", len(migrated))
+
+    def persist(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, {}
+        upserts = [dict(entry) for entry in dirty.values() if entry is not None]
+        deletes = [key for key, entry in dirty.items() if entry is None]
+        _save_in_background("absences", get_storage().apply_absence_changes, upserts, deletes)
+
+absences = AbsenceRepository()
+
+def load_data():
+    return [dict(entry) for entry in absences.all()]
 
 def save_data(data):
-    logger.info("Saving absence data.")
-    os.makedirs(os.path.dirname(DATA_FILE), exist_ok=True)
-    with open(DATA_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    absences.replace_all(data)
+
+def get_entry(user_id, guild_id):
+    return absences.get(guild_id, user_id)
+
+def get_guild_entries(guild_id):
+    return absences.for_guild(guild_id)
+
+def get_all_entries():
+    return absences.all()
 
 def add_or_update_entry(user_id, username, date_str, guild_id):
-    logger.info(f"Adding/updating absence entry for {username} ({user_id}) to {date_str} (guild: {guild_id})")
-    data = load_data()
-    for entry in data:
-        if entry.get("user_id") == user_id and entry.get("guild_id") == guild_id:
-            entry["date"] = date_str
-            entry["notified"] = False
-            break
+    date_str = to_iso(date_str) or date_str
+    logger.info("Adding/updating absence entry for %s (%s) to %s (guild: %s)", username, user_id, date_str, guild_id)
+    entry = absences.get(guild_id, user_id)
+    if entry is not None:
+        entry["date"] = date_str
+        entry["notified"] = False
+        absences.upsert(entry)
     else:
-        data.append({
+        absences.upsert({
             "user_id": user_id,
             "username": username,
             "date": date_str,
             "notified": False,
             "guild_id": guild_id
         })
-    save_data(data)
+
+def update_entry(user_id, guild_id, persist=True, expected_version=None, **fields):
+    entry = absences.get(guild_id, user_id)
+    if entry is None or (expected_version is not None and absences.version(guild_id, user_id) != expected_version):
+        return None
+    entry.update(fields)
+    return absences.upsert(entry, persist=persist)
+
+def annotate_entry(user_id, guild_id, **fields):
+    return absences.annotate(guild_id, user_id, **fields)
 
 def remove_entry(user_id, guild_id):
-    logger.info(f"Removing absence entry for user {user_id} in guild {guild_id}")
-    data = load_data()
-    new_data = [e for e in data if not (e.get("user_id") == user_id and e.get("guild_id") == guild_id)]
-    if len(new_data) == len(data):
-        logger.warning(f"No entry found for user {user_id} in guild {guild_id} to remove.")
+    logger.info("Removing absence entry for user %s in guild %s", user_id, guild_id)
+    if absences.remove(guild_id, user_id) is None:
+        logger.warning("No entry found for user %s in guild %s to remove.", user_id, guild_id)
         return False
-    save_data(new_data)
+    return True
+
+def persist_entries():
+    absences.persist()
+
+_entry_locks = {}
+
+@asynccontextmanager
+async def entry_lock(guild_id, user_id):
+    key = (guild_id, user_id)
+    lock, users = _entry_locks.get(key, (None, 0))
+    if lock is None:
+        lock = asyncio.Lock()
+    _entry_locks[key] = (lock, users + 1)
+    try:
+        async with lock:
+            yield
+    finally:
+        lock, users = _entry_locks[key]
+        if users <= 1:
+            del _entry_locks[key]
+        else:
+            _entry_locks[key] = (lock, users - 1)
+
+def parse_entry_date(entry):
+    return parse_date(entry.get("date"))
+
+def _normalize_entry_date(entry):
+    iso = to_iso(entry.get("date"))
+    if iso is None or iso == entry.get("date"):
+        return False
+    entry["date"] = iso
     return True
 
 def validate_date(date_str):
-    if not DATE_PATTERN.match(date_str):
-        logger.warning(f"Date validation failed for input: {date_str}")
+    parsed_date = parse_date(date_str)
+    if parsed_date is None:
+        logger.warning("Date validation failed for input: %s", date_str)
         return None
-    try:
-        parsed_date = datetime.strptime(date_str, "%d.%m.%Y")
-        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-        if parsed_date < today:
-            logger.warning(f"Rejected past date: {date_str}")
-            return None
-        return parsed_date
-    except ValueError:
-        logger.error(f"ValueError in date validation: {date_str}")
+    if parsed_date < date.today():
+        logger.warning("Rejected past date: %s", date_str)
         return None
+    return parsed_date
+
+_role_cache = {}
+
+def get_absence_role(guild, cfg=None):
+    role = _role_cache.get(guild.id)
+    if role is not None:
+        return role
+
+    cfg = cfg if cfg is not None else get_guild_config(guild.id)
+    role_id = cfg.get("role_id")
+    if role_id:
+        role = guild.get_role(role_id)
+    else:
+        import discord
+        role_name = cfg.get("role_name", DEFAULT_ROLE_NAME)
+        role = discord.utils.get(guild.roles, name=role_name)
+        if role:
+            update_guild_config(guild.id, role_id=role.id, role_name=role.name)
+            logger.info("Migrated absence role '%s' to role ID %s in guild %s.", role.name, role.id, guild.id)
 
-def get_role(guild, role_name):
-    import discord
-    role = discord.utils.get(guild.roles, name=role_name)
     if not role:
-        logger.warning(f"Role '{role_name}' not found in guild {guild.name}.")
+        logger.warning("Absence role %r not found in guild %s.", role_id or cfg.get('role_name', DEFAULT_ROLE_NAME), guild.name)
+        return None
+    _role_cache[guild.id] = role
     return role
 
+def refresh_role_cache(role):
+    cfg = get_guild_config(role.guild.id)
+    if cfg.get("role_id") != role.id:
+        return
+    _role_cache[role.guild.id] = role
+    if cfg.get("role_name") != role.name:
+        update_guild_config(role.guild.id, role_name=role.name)
+
+def invalidate_role_cache(guild_id):
+    _role_cache.pop(guild_id, None)
+
+_member_cache = OrderedDict()
+
+def _cached_member(guild_id, user_id):
+    cached = _member_cache.get((guild_id, user_id))
+    if cached is None:
+        return False, None
+    expires, member = cached
+    if expires < time.monotonic():
+        del _member_cache[(guild_id, user_id)]
+        return False, None
+    return True, member
+
+def _cache_member(guild_id, user_id, member):
+    now = time.monotonic()
+    key = (guild_id, user_id)
+    _member_cache[key] = (now + MEMBER_CACHE_TTL, member)
+    _member_cache.move_to_end(key)
+    _prune_member_cache(now)
+
+def _prune_member_cache(now):
+    while _member_cache:
+        expires, _ = next(iter(_member_cache.values()))
+        if expires >= now:
+            break
+        _member_cache.popitem(last=False)
+
+def forget_member(guild_id, user_id):
+    _member_cache.pop((guild_id, user_id), None)
+
 async def get_member(guild, user_id):
     member = guild.get_member(user_id)
-    if member is None:
+    if member is not None:
+        return member
+    hit, member = _cached_member(guild.id, user_id)
+    if hit:
+        return member
+    import discord
+    try:
+        member = await guild.fetch_member(user_id)
+    except discord.NotFound:
+        _cache_member(guild.id, user_id, None)
+        return None
+    except Exception as e:
+        logger.error("Failed to fetch member %s in guild %s: %s", user_id, guild.id, e)
+        return None
+    _cache_member(guild.id, user_id, member)
+    return member
+
+async def resolve_members(guild, user_ids):
+    members = {}
+    missing = []
+    for user_id in user_ids:
+        member = guild.get_member(user_id)
+        if member is None:
+            hit, member = _cached_member(guild.id, user_id)
+            if not hit:
+                missing.append(user_id)
+                continue
+        members[user_id] = member
+
+    for start in range(0, len(missing), MEMBER_QUERY_BATCH):
+        batch = missing[start:start + MEMBER_QUERY_BATCH]
         try:
-            member = await guild.fetch_member(user_id)
+            found = await guild.query_members(user_ids=batch, limit=len(batch), cache=True)
         except Exception as e:
-            logger.error(f"Failed to fetch member {user_id} in guild {guild.id}: {e}")
-            return None
-    return member
+            logger.error("Member query for %s users in guild %s failed: %s", len(batch), guild.id, e)
+            for user_id in batch:
+                members[user_id] = await get_member(guild, user_id)
+            continue
+        for member in found:
+            members[member.id] = member
+            _cache_member(guild.id, member.id, member)
+        for user_id in batch:
+            if user_id not in members:
+                members[user_id] = None
+                _cache_member(guild.id, user_id, None)
+
+    if missing:
+        logger.info("Resolved %s uncached members in guild %s via gateway query.", len(missing), guild.id)
+    return members
 
 async def modify_role(member, role, add=True):
     try:
         if add:
             await member.add_roles(role, reason="Abwesenheit eingetragen")
-            logger.info(f"Added role '{role.name}' to {member.display_name}")
+            logger.info("Added role '%s' to %s", role.name, member.display_name)
         else:
             await member.remove_roles(role, reason="Abwesenheit beendet")
-            logger.info(f"Removed role '{role.name}' from {member.display_name}")
+            logger.info("Removed role '%s' from %s", role.name, member.display_name)
         return True
     except Exception as e:
-        logger.error(f"Failed to modify role for {member.display_name}: {e}", exc_info=True)
+        logger.error("Failed to modify role for %s: %s", member.display_name, e, exc_info=True)
         return False
 
 def is_admin_or_owner(ctx):
     return ctx.author == ctx.guild.owner or ctx.author.guild_permissions.administrator
 
-async def ensure_single_embed(channel, bot, embed, view):
-  def is_absence_embed(message):
+def is_panel_message(message, bot):
     if message.author != bot.user or not message.embeds:
         return False
     emb = message.embeds[0]
     thumb_url = emb.thumbnail.url if emb.thumbnail else None
     return thumb_url == ABSENCE_MANAGER_THUMB_URL
 
-  messages = [m async for m in channel.history(limit=50)]
-  bot_embeds = [m for m in messages if is_absence_embed(m)]
+def _panel_matches(message, embed):
+    if not message.embeds:
+        return False
+    current = message.embeds[0]
+    return (
+        current.title == embed.title
+        and current.description == embed.description
+        and current.footer.text == embed.footer.text
+    )
 
-  if len(bot_embeds) == 1:
-    return
-  elif len(bot_embeds) == 0:
-    await channel.send(embed=embed, view=view)
-  else:
+def remember_panel_message(message):
+    update_guild_config(message.guild.id, panel_channel_id=message.channel.id, panel_message_id=message.id)
+
+async def _repair_panel(channel, bot, embed, view):
+    logger.info("Scanning history of #%s (%s) for absence panels.", channel.name, channel.guild.id)
+    messages = [m async for m in channel.history(limit=50)]
+    bot_embeds = [m for m in messages if is_panel_message(m, bot)]
+
+    if len(bot_embeds) == 1:
+        message = bot_embeds[0]
+        if not _panel_matches(message, embed):
+            await message.edit(embed=embed, view=view)
+        return message
     for msg in bot_embeds:
-      await msg.delete()
-    await channel.send(embed=embed, view=view)
+        await msg.delete()
+    return await channel.send(embed=embed, view=view)
+
+async def ensure_single_embed(channel, bot, embed, view, force_edit=False):
+    import discord
+    cfg = get_guild_config(channel.guild.id)
+    message_id = cfg.get("panel_message_id")
+    if message_id and cfg.get("panel_channel_id") == channel.id:
+        try:
+            if force_edit:
+                return await channel.get_partial_message(message_id).edit(embed=embed, view=view)
+            message = await channel.fetch_message(message_id)
+            if not _panel_matches(message, embed):
+                await message.edit(embed=embed, view=view)
+            return message
+        except discord.NotFound:
+            logger.info("Stored absence panel %s is gone in guild %s, repairing.", message_id, channel.guild.id)
+
+    message = await _repair_panel(channel, bot, embed, view)
+    remember_panel_message(message)
+    return message
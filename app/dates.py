@@ -0,0 +1,36 @@
+import re
+from datetime import date
+
+_USER_DATE = re.compile(r"(\d{1,2})[./-](\d{1,2})[./-](\d{4}|\d{2})$")
+
+
+def parse_date(text):
+    if not isinstance(text, str):
+        return None
+    text = text.strip()
+    try:
+        if len(text) == 10 and text[4] == "-" and text[7] == "-":
+            return date.fromisoformat(text)
+        match = _USER_DATE.match(text)
+        if match is None:
+            return None
+        day, month, year = match.groups()
+        year = int(year)
+        if year < 100:
+            year += 2000
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def to_iso(text):
+    parsed = parse_date(text)
+    return parsed.isoformat() if parsed else None
+
+
+def format_date(value):
+    if isinstance(value, str):
+        value = parse_date(value)
+        if value is None:
+            return ""
+    return f"{value.day:02d}.{value.month:02d}.{value.year}"
@@ -0,0 +1,124 @@
+import asyncio, json, os, random
+from datetime import datetime, timedelta
+import discord
+
+from config import DM_UNDELIVERABLE_FILE, annotate_entry, write_file_in_background
+from logger import get_logger
+from metrics import inc
+from storage import dump_compact
+
+logger = get_logger(__name__)
+
+DM_CONCURRENCY = int(os.environ.get("DM_CONCURRENCY", "4"))
+DM_MAX_ATTEMPTS = 5
+DM_BASE_BACKOFF = 2.0
+UNDELIVERABLE_TTL = timedelta(days=7)
+
+DM_PENDING = "pending"
+DM_SENT = "sent"
+DM_FAILED = "failed"
+DM_UNDELIVERABLE = "undeliverable"
+
+
+class DMQueue:
+    def __init__(self, client: discord.Client, concurrency: int = DM_CONCURRENCY):
+        self.client = client
+        self.concurrency = concurrency
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._undeliverable = self._load_undeliverable()
+
+    def _load_undeliverable(self) -> dict[int, str]:
+        if not os.path.isfile(DM_UNDELIVERABLE_FILE):
+            return {}
+        try:
+            with open(DM_UNDELIVERABLE_FILE, "r", encoding="utf-8") as f:
+                return {int(user_id): since for user_id, since in json.load(f).items()}
+        except (json.JSONDecodeError, ValueError):
+            logger.error("Undeliverable DM cache is unreadable, starting empty.")
+            return {}
+
+    def _save_undeliverable(self):
+        text = dump_compact({str(k): v for k, v in self._undeliverable.items()})
+        write_file_in_background("dm_undeliverable", DM_UNDELIVERABLE_FILE, text)
+
+    def is_running(self) -> bool:
+        return any(not worker.done() for worker in self._workers)
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info("Started DM delivery queue with %s workers.", self.concurrency)
+
+    async def stop(self, timeout: float = 10.0):
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Dropping %s undelivered DMs on shutdown.", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    def is_undeliverable(self, user_id: int) -> bool:
+        since = self._undeliverable.get(user_id)
+        if since is None:
+            return False
+        if datetime.now() - datetime.fromisoformat(since) > UNDELIVERABLE_TTL:
+            del self._undeliverable[user_id]
+            self._save_undeliverable()
+            return False
+        return True
+
+    def enqueue(self, user_id: int, content: str, view: discord.ui.View | None = None, entry_key=None) -> bool:
+        if self.is_undeliverable(user_id):
+            self._record(entry_key, DM_UNDELIVERABLE)
+            return False
+        self._record(entry_key, DM_PENDING)
+        self._queue.put_nowait((user_id, content, view, entry_key))
+        return True
+
+    def _record(self, entry_key, status: str):
+        inc("dm_total", status=status)
+        if entry_key is None:
+            return
+        guild_id, user_id = entry_key
+        annotate_entry(user_id, guild_id, dm_status=status)
+
+    def _mark_undeliverable(self, user_id: int):
+        self._undeliverable[user_id] = datetime.now().isoformat(timespec="seconds")
+        self._save_undeliverable()
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._deliver(*job)
+            except Exception as e:
+                logger.error("Unexpected error delivering DM to %s: %s", job[0], e, exc_info=True)
+                inc("errors_total", source="dm")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, user_id: int, content: str, view, entry_key):
+        for attempt in range(DM_MAX_ATTEMPTS):
+            try:
+                user = self.client.get_user(user_id) or await self.client.fetch_user(user_id)
+                if view is not None:
+                    await user.send(content, view=view)
+                else:
+                    await user.send(content)
+                self._record(entry_key, DM_SENT)
+                return
+            except (discord.Forbidden, discord.NotFound):
+                logger.info("User %s does not accept DMs, caching as undeliverable.", user_id)
+                self._mark_undeliverable(user_id)
+                self._record(entry_key, DM_UNDELIVERABLE)
+                return
+            except discord.HTTPException as e:
+                if 400 <= e.status < 500 and e.status != 429:
+                    logger.warning("DM to %s rejected with HTTP %s: %s", user_id, e.status, e)
+                    break
+                delay = DM_BASE_BACKOFF * (2 ** attempt) + random.uniform(0, 1)
+                logger.warning("DM to %s failed (attempt %s/%s), retrying in %.1fs.", user_id, attempt + 1, DM_MAX_ATTEMPTS, delay)
+                await asyncio.sleep(delay)
+        inc("errors_total", source="dm")
+        self._record(entry_key, DM_FAILED)
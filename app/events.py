@@ -1,28 +1,109 @@
+import asyncio, os, time
 import discord
 
-from absence import AbwesenheitView, build_manager_embed
-from command_translator import TableTranslator
+from absence import AbwesenheitView, get_manager_payload, log_absence_event_by_guild
+from command_translator import TableTranslator, command_tree_hash, load_synced_hash, save_synced_hash
 from localization import tg
-from config import ensure_single_embed, get_guild_config, get_role, DEFAULT_ROLE_NAME, remove_entry
-from logger import logger
+from config import (
+    ensure_single_embed, get_guild_config, get_all_entries, get_entry, get_absence_role,
+    entry_lock, forget_member, invalidate_role_cache, refresh_role_cache, remove_entry
+)
+from logger import get_logger
+from metrics import set_gauge
+from sharding import WORKER_ID, owns_guild, shard_stats
+
+logger = get_logger(__name__)
+
+
+STARTUP_CONCURRENCY = int(os.environ.get("STARTUP_CONCURRENCY", "10"))
+
+
+def _panel_channel(guild: discord.Guild, cfg: dict):
+    for channel_id in (cfg.get("channel_id"), cfg.get("panel_channel_id")):
+        channel = guild.get_channel(channel_id) if channel_id else None
+        if channel is not None:
+            return channel
+    for ch in guild.text_channels:
+        perms = ch.permissions_for(guild.me)
+        if perms.send_messages and perms.manage_messages:
+            return ch
+    return None
+
+
+async def _reconcile_panel(bot, guild: discord.Guild) -> bool:
+    target_channel = _panel_channel(guild, get_guild_config(guild.id))
+    if target_channel is None:
+        logger.info("No suitable channel found in %s for Abwesenheitsmanager.", guild.name)
+        return True
+
+    try:
+        embed, view = get_manager_payload(guild.id)
+        await ensure_single_embed(target_channel, bot, embed, view)
+        logger.info("Checked/managed absence embed in %s (%s)", target_channel.name, guild.name)
+        return True
+    except Exception as e:
+        logger.error("Error managing embed in channel #%s: %s", target_channel.name, e, exc_info=True)
+        return False
 
 
 def register_events(bot):
+    bot.reconciled_guilds = set()
+    bot.ready_shards = set()
+    reconciling = set()
+    semaphore = asyncio.Semaphore(STARTUP_CONCURRENCY)
+
+    async def reconcile_panels(shard_id=None):
+        pending = [
+            guild for guild in bot.guilds
+            if (shard_id is None or guild.shard_id == shard_id)
+            and guild.id not in bot.reconciled_guilds and guild.id not in reconciling
+        ]
+        reconciling.update(guild.id for guild in pending)
+
+        async def worker(guild):
+            try:
+                async with semaphore:
+                    if await _reconcile_panel(bot, guild):
+                        bot.reconciled_guilds.add(guild.id)
+            finally:
+                reconciling.discard(guild.id)
+
+        await asyncio.gather(*(worker(guild) for guild in pending))
+        return len(pending)
+
     @bot.event
     async def on_ready():
+        timings = {}
+        phase_start = time.perf_counter()
+
         if not hasattr(bot, "_translator_set"):
             await bot.tree.set_translator(TableTranslator())
             bot._translator_set = True
             logger.info("Registered app_commands translator.")
+        timings["translator"] = time.perf_counter() - phase_start
 
-        try:
-            synced = await bot.tree.sync()
-            logger.info(f"Synced {len(synced)} slash commands with Discord.")
-        except Exception as e:
-            logger.error(f"Error syncing slash commands: {e}", exc_info=True)
+        phase_start = time.perf_counter()
+        if not getattr(bot, "_commands_synced", False):
+            tree_hash = command_tree_hash(bot.tree)
+            if WORKER_ID != 0:
+                bot._commands_synced = True
+                logger.info("Cluster worker %s leaves slash command sync to worker 0.", WORKER_ID)
+            elif not getattr(bot, "force_sync", False) and tree_hash == load_synced_hash():
+                bot._commands_synced = True
+                logger.info("Slash command tree unchanged since last sync, skipping sync.")
+            else:
+                try:
+                    synced = await bot.tree.sync()
+                    save_synced_hash(tree_hash)
+                    bot._commands_synced = True
+                    logger.info("Synced %s slash commands with Discord.", len(synced))
+                except Exception as e:
+                    logger.error("Error syncing slash commands: %s", e, exc_info=True)
+        timings["sync"] = time.perf_counter() - phase_start
 
-        logger.info(f"Bot gestartet als {bot.user} (ID: {bot.user.id})")
+        logger.info("Bot gestartet als %s (ID: %s)", bot.user, bot.user.id)
 
+        phase_start = time.perf_counter()
         if not hasattr(bot, "_abwesenheit_view_added"):
             bot.add_view(AbwesenheitView())
             bot._abwesenheit_view_added = True
@@ -32,59 +113,103 @@ def register_events(bot):
             bot.check_dates_loop.start()
             logger.info("Started absence check background task.")
 
+        if hasattr(bot, "absence_scheduler") and not bot.absence_scheduler.is_running():
+            bot.absence_scheduler.start([entry for entry in get_all_entries() if owns_guild(bot, entry["guild_id"])])
+
+        if hasattr(bot, "dm_queue") and not bot.dm_queue.is_running():
+            bot.dm_queue.start()
+
         if hasattr(bot, "change_status_loop") and not bot.change_status_loop.is_running():
             bot.change_status_loop.start()
             logger.info("Started status rotation task.")
+        timings["tasks"] = time.perf_counter() - phase_start
 
-        for guild in bot.guilds:
-            cfg = get_guild_config(guild.id)
-            channel_id = cfg.get("channel_id") if cfg else None
+        phase_start = time.perf_counter()
+        reconciled = await reconcile_panels()
+        timings["panels"] = time.perf_counter() - phase_start
 
-            target_channel = guild.get_channel(channel_id) if channel_id else None
-            if target_channel is None:
-                for ch in guild.text_channels:
-                    perms = ch.permissions_for(guild.me)
-                    if perms.send_messages and perms.manage_messages:
-                        target_channel = ch
-                        break
+        logger.info(
+            "Startup finished: %s guild panels reconciled, %s skipped (concurrency %s); %s",
+            reconciled, len(bot.guilds) - reconciled, STARTUP_CONCURRENCY,
+            ", ".join(f"{phase}={duration:.3f}s" for phase, duration in timings.items())
+        )
 
-            if target_channel:
-                try:
-                    embed = build_manager_embed(guild.id)
-                    view = AbwesenheitView(guild_id=guild.id)
-                    await ensure_single_embed(target_channel, bot, embed, view)
-                    logger.info(f"Checked/managed absence embed in {target_channel.name} ({guild.name})")
-                except Exception as e:
-                    logger.error(f"Error managing embed in channel #{target_channel.name}: {e}", exc_info=True)
-            else:
-                logger.info(f"No suitable channel found in {guild.name} for Abwesenheitsmanager.")
+    @bot.event
+    async def on_shard_ready(shard_id: int):
+        bot.ready_shards.add(shard_id)
+        set_gauge("gateway_latency_seconds", lambda: shard_stats(bot).get(shard_id, {}).get("latency"), shard=shard_id)
+        set_gauge("guilds", lambda: shard_stats(bot).get(shard_id, {}).get("guilds"), shard=shard_id)
+        guilds = sum(1 for guild in bot.guilds if guild.shard_id == shard_id)
+        logger.info("Shard %s/%s ready with %s guilds.", shard_id, bot.shard_count, guilds)
+        reconciled = await reconcile_panels(shard_id)
+        logger.info("Shard %s: %s guild panels reconciled.", shard_id, reconciled)
 
     @bot.event
     async def on_member_update(before: discord.Member, after: discord.Member):
         if before.guild is None:
             return
 
+        if get_entry(after.id, after.guild.id) is None:
+            return
+
+        removed_role_ids = {r.id for r in before.roles} - {r.id for r in after.roles}
+        if not removed_role_ids:
+            return
+
         cfg = get_guild_config(after.guild.id)
-        role_name = cfg.get("role_name", DEFAULT_ROLE_NAME)
-        role = get_role(after.guild, role_name)
-        if role is None:
+        role = get_absence_role(after.guild, cfg)
+        if role is None or role.id not in removed_role_ids:
+            return
+
+        async with entry_lock(after.guild.id, after.id):
+            removed = remove_entry(after.id, after.guild.id)
+        if removed:
+            await log_absence_event_by_guild(
+                bot,
+                after.guild.id,
+                tg(
+                    after.guild.id,
+                    "log.entry_deleted_role_removed",
+                    guild=after.guild.name,
+                    user=after.mention,
+                    role=role.name,
+                )
+            )
+            logger.info("Removed absence entry because role was removed: %s in guild %s", after, after.guild.id)
+
+    @bot.event
+    async def on_member_join(member: discord.Member):
+        forget_member(member.guild.id, member.id)
+
+    @bot.event
+    async def on_member_remove(member: discord.Member):
+        forget_member(member.guild.id, member.id)
+        if get_entry(member.id, member.guild.id) is None:
             return
 
-        had_role = role in before.roles
-        has_role = role in after.roles
-
-        if had_role and not has_role:
-            if remove_entry(after.id, after.guild.id):
-                log_channel_id = cfg.get("logging_channel_id")
-                log_ch = after.guild.get_channel(log_channel_id) if log_channel_id else None
-                if log_ch:
-                    await log_ch.send(
-                        tg(
-                            after.guild.id,
-                            "log.entry_deleted_role_removed",
-                            guild=after.guild.name,
-                            user=after.mention,
-                            role=role.name,
-                        )
-                    )
-                logger.info(f"Removed absence entry because role was removed: {after} in guild {after.guild.id}")
+        async with entry_lock(member.guild.id, member.id):
+            entry = get_entry(member.id, member.guild.id)
+            removed = entry is not None and remove_entry(member.id, member.guild.id)
+        if removed:
+            await log_absence_event_by_guild(
+                bot,
+                member.guild.id,
+                tg(
+                    member.guild.id,
+                    "log.entry_deleted_user_left",
+                    guild=member.guild.name,
+                    username=entry.get("username", "Unknown"),
+                    user_id=member.id,
+                )
+            )
+            logger.info("Removed absence entry because user left: %s in guild %s", member, member.guild.id)
+
+    @bot.event
+    async def on_guild_role_update(before: discord.Role, after: discord.Role):
+        refresh_role_cache(after)
+
+    @bot.event
+    async def on_guild_role_delete(role: discord.Role):
+        if get_guild_config(role.guild.id).get("role_id") == role.id:
+            invalidate_role_cache(role.guild.id)
+            logger.warning("Absence role %s (%s) was deleted in guild %s.", role.name, role.id, role.guild.id)
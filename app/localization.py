@@ -1,7 +1,11 @@
 from __future__ import annotations
 
-from typing import Any, Mapping
+from string import Formatter
+from typing import Any, Iterator, Mapping
 from config import get_guild_config
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 SUPPORTED_LANGUAGES: dict[str, str] = {
     "de": "Deutsch",
@@ -18,14 +22,20 @@ LOCALES: dict[str, dict[str, Any]] = {
         "cmd": {
             "set_channel": {"desc": "Setzt den Kanal für Abwesenheitsnachrichten."},
             "set_role": {"desc": "Setzt die Rolle für abwesende Mitglieder."},
-            "set_logging_channel": {"desc": "Setzt den Kanal für Abwesenheits-Logs."},
+            "set_logging_channel": {
+                "desc": "Setzt den Kanal für Abwesenheits-Logs.",
+                "use_webhook": "Logs über einen Kanal-Webhook senden.",
+            },
             "show_config": {"desc": "Zeigt die aktuelle Bot-Konfiguration für diesen Server."},
             "show_absent_users": {"desc": "Zeigt alle derzeit abwesenden Benutzer und deren geplantes Rückkehrdatum."},
             "set_language": {"desc": "Setzt die Sprache des Bots für diesen Server."},
+            "stats": {"desc": "Zeigt Laufzeitstatistiken des Bots."},
+            "profile": {"desc": "Profiliert die nächsten Abgleiche oder Interaktionen (nur Bot-Owner).", "count": "Anzahl der zu profilierenden Durchläufe"},
         },
         "errors": {
             "role_modify": "Fehler: Kann Rolle `{role}` nicht {action}.",
             "send_absence_manager_failed": "❌ Fehler beim Senden der Nachricht in {channel}. Bitte prüfe die Berechtigungen.",
+            "webhook_create_failed": "❌ Konnte keinen Webhook in {channel} erstellen. Bitte prüfe die Berechtigung „Webhooks verwalten“.",
         },
         "absence": {
             "set_ok": "✅ **Abwesenheit eingetragen!**\nBis **{date}**.",
@@ -78,6 +88,25 @@ LOCALES: dict[str, dict[str, Any]] = {
             "absent_users_entry": "Rückkehrdatum: **{date}**\n{relative}",
             "absent_users_invalid_date": "Ungültiges Datum gespeichert: `{date}`",
             "absent_users_none_in_server": "✅ Es sind derzeit keine abwesenden Benutzer im Server.",
+            "stats_title": "📊 Bot-Statistiken",
+            "stats_reconcile": "Letzter Abgleich",
+            "stats_reconcile_value": "{entries} Einträge in {duration}s – {removed} gelöscht, {notified} benachrichtigt",
+            "stats_storage": "Speicher",
+            "stats_rest": "Discord-API",
+            "stats_rest_value": "{requests} Anfragen, {errors} Fehler",
+            "stats_interactions": "Interaktionen",
+            "stats_gateway": "Shards",
+            "stats_shard": "Shard {shard}: {latency} ms, {guilds} Server",
+            "stats_loop": "Event-Loop",
+            "stats_loop_value": "Max. Verzögerung (1 Min.): {lag} ms, {pending} ausstehende Speichervorgänge",
+            "stats_cluster": "Cluster",
+            "stats_worker": "Worker {worker}: {shards} Shards, {guilds} Server (vor {age}s aktualisiert)",
+            "stats_more": "… und {count} weitere",
+            "stats_never": "Noch keine Daten.",
+            "profile_owner_only": "⛔ Nur der Bot-Owner kann das Profiling starten.",
+            "profile_busy": "⚠️ Es läuft bereits eine Profiling-Sitzung.",
+            "profile_armed": "🔬 Profiling aktiviert für die nächsten {count} `{target}`-Durchläufe. Die Zusammenfassung kommt per DM.",
+            "profile_done": "🔬 Profiling von {count} `{target}`-Durchläufen abgeschlossen. Bericht: `{path}`",
         },
         "log": {
             "absence_set": "📋 {user} hat sich als abwesend eingetragen bis **{date}**.",
@@ -116,14 +145,20 @@ LOCALES: dict[str, dict[str, Any]] = {
         "cmd": {
             "set_channel": {"desc": "Sets the channel for absence messages."},
             "set_role": {"desc": "Sets the role for absent members."},
-            "set_logging_channel": {"desc": "Sets the channel for absence logs."},
+            "set_logging_channel": {
+                "desc": "Sets the channel for absence logs.",
+                "use_webhook": "Send logs through a channel webhook.",
+            },
             "show_config": {"desc": "Shows the current bot configuration for this server."},
             "show_absent_users": {"desc": "Shows all currently absent users and their planned return date."},
             "set_language": {"desc": "Sets the bot language for this server."},
+            "stats": {"desc": "Shows runtime statistics of the bot."},
+            "profile": {"desc": "Profiles the next reconciliations or interactions (bot owner only).", "count": "Number of runs to profile"},
         },
         "errors": {
             "role_modify": "Error: Cannot {action} role `{role}`.",
             "send_absence_manager_failed": "❌ Failed to send the message in {channel}. Please check permissions.",
+            "webhook_create_failed": "❌ Could not create a webhook in {channel}. Please check the Manage Webhooks permission.",
         },
         "absence": {
             "set_ok": "✅ **Absence recorded!**\nUntil **{date}**.",
@@ -176,6 +211,25 @@ LOCALES: dict[str, dict[str, Any]] = {
             "absent_users_entry": "Return date: **{date}**\n{relative}",
             "absent_users_invalid_date": "Invalid date stored: `{date}`",
             "absent_users_none_in_server": "✅ There are currently no absent users on this server.",
+            "stats_title": "📊 Bot statistics",
+            "stats_reconcile": "Last reconciliation",
+            "stats_reconcile_value": "{entries} entries in {duration}s – {removed} deleted, {notified} notified",
+            "stats_storage": "Storage",
+            "stats_rest": "Discord API",
+            "stats_rest_value": "{requests} requests, {errors} errors",
+            "stats_interactions": "Interactions",
+            "stats_gateway": "Shards",
+            "stats_shard": "Shard {shard}: {latency} ms, {guilds} servers",
+            "stats_loop": "Event loop",
+            "stats_loop_value": "Max lag (1 min): {lag} ms, {pending} pending storage writes",
+            "stats_cluster": "Cluster",
+            "stats_worker": "Worker {worker}: {shards} shards, {guilds} servers (updated {age}s ago)",
+            "stats_more": "… and {count} more",
+            "stats_never": "No data yet.",
+            "profile_owner_only": "⛔ Only the bot owner can start profiling.",
+            "profile_busy": "⚠️ A profiling session is already running.",
+            "profile_armed": "🔬 Profiling armed for the next {count} `{target}` runs. The summary will be sent via DM.",
+            "profile_done": "🔬 Profiling of {count} `{target}` runs finished. Report: `{path}`",
         },
         "log": {
             "absence_set": "📋 {user} recorded an absence until **{date}**.",
@@ -208,22 +262,77 @@ LOCALES: dict[str, dict[str, Any]] = {
 }
 
 
-def _deep_get(d: Mapping[str, Any], key: str) -> Any:
-    cur: Any = d
-    for part in key.split("."):
-        if not isinstance(cur, Mapping) or part not in cur:
-            return None
-        cur = cur[part]
-    return cur
+DEFAULT_LANGUAGE = "de"
+
+
+def _flatten(tree: Mapping[str, Any], prefix: str = "") -> Iterator[tuple[str, str]]:
+    for key, value in tree.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, Mapping):
+            yield from _flatten(value, path + ".")
+        elif isinstance(value, str):
+            yield path, value
+
+
+def _placeholders(text: str) -> frozenset[str] | None:
+    names = set()
+    literal_braces = False
+    for literal, field, _, _ in Formatter().parse(text):
+        if "{" in literal or "}" in literal:
+            literal_braces = True
+        if field is not None:
+            names.add(field.split(".", 1)[0].split("[", 1)[0])
+    if not names and not literal_braces:
+        return None
+    return frozenset(names)
+
+
+def _compile_catalog() -> dict[tuple[str, str], tuple[str, frozenset[str] | None]]:
+    flat = {lang: dict(_flatten(tree)) for lang, tree in LOCALES.items()}
+    fallback = flat[DEFAULT_LANGUAGE]
+    catalog = {}
+    for lang, texts in flat.items():
+        for key in fallback.keys() | texts.keys():
+            text = texts.get(key, fallback.get(key))
+            catalog[(lang, key)] = (text, _placeholders(text))
+    return catalog
+
+
+def validate_catalog() -> list[str]:
+    flat = {lang: dict(_flatten(tree)) for lang, tree in LOCALES.items()}
+    problems = []
+    for lang, texts in flat.items():
+        for other, other_texts in flat.items():
+            if other == lang:
+                continue
+            for key in sorted(other_texts.keys() - texts.keys()):
+                problems.append(f"[{lang}] missing key '{key}' (present in '{other}')")
+        if lang == DEFAULT_LANGUAGE:
+            continue
+        for key in sorted(texts.keys() & flat[DEFAULT_LANGUAGE].keys()):
+            ours = _placeholders(texts[key]) or frozenset()
+            theirs = _placeholders(flat[DEFAULT_LANGUAGE][key]) or frozenset()
+            if ours != theirs:
+                problems.append(
+                    f"[{lang}] placeholders for '{key}' differ from '{DEFAULT_LANGUAGE}': "
+                    f"{sorted(ours)} vs {sorted(theirs)}"
+                )
+    return problems
+
+
+_CATALOG = _compile_catalog()
+
+for _problem in validate_catalog():
+    logger.warning("Localization: %s", _problem)
 
 
 def t(lang: str, key: str, **kwargs) -> str:
-    lang = lang if lang in LOCALES else "de"
-    text = _deep_get(LOCALES[lang], key)
-    if not isinstance(text, str):
-        text = _deep_get(LOCALES["de"], key)
-    if not isinstance(text, str):
+    entry = _CATALOG.get((lang, key)) or _CATALOG.get((DEFAULT_LANGUAGE, key))
+    if entry is None:
         return key
+    text, fields = entry
+    if fields is None or not fields <= kwargs.keys():
+        return text
     try:
         return text.format(**kwargs)
     except Exception:
@@ -231,5 +340,5 @@ def t(lang: str, key: str, **kwargs) -> str:
 
 
 def tg(guild_id: int, key: str, **kwargs) -> str:
-    lang = get_guild_config(guild_id).get("language", "de")
+    lang = get_guild_config(guild_id).get("language", DEFAULT_LANGUAGE)
     return t(lang, key, **kwargs)
@@ -0,0 +1,100 @@
+import asyncio, os
+import discord
+
+from config import get_guild_config, update_guild_config
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+LOG_FLUSH_DELAY = float(os.environ.get("LOG_FLUSH_DELAY", "2.0"))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "20"))
+MESSAGE_LIMIT = 2000
+WEBHOOK_NAME = "Ciaorella"
+
+
+def chunk_lines(lines, limit=MESSAGE_LIMIT):
+    chunks = []
+    current = ""
+    for line in lines:
+        line = line[:limit]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class LogDigest:
+    def __init__(self, client: discord.Client):
+        self.client = client
+        self._buffers: dict[int, list[str]] = {}
+        self._timers: dict[int, asyncio.Task] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+        self._flushes: set[asyncio.Task] = set()
+
+    def _track(self, task: asyncio.Task):
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    def enqueue(self, guild_id: int, message: str):
+        buffer = self._buffers.setdefault(guild_id, [])
+        buffer.append(message)
+        if len(buffer) >= LOG_BATCH_SIZE:
+            timer = self._timers.pop(guild_id, None)
+            if timer is not None:
+                timer.cancel()
+            self._track(asyncio.create_task(self.flush(guild_id)))
+        elif guild_id not in self._timers:
+            self._timers[guild_id] = asyncio.create_task(self._flush_later(guild_id))
+
+    async def _flush_later(self, guild_id: int):
+        await asyncio.sleep(LOG_FLUSH_DELAY)
+        self._timers.pop(guild_id, None)
+        self._track(asyncio.current_task())
+        await self.flush(guild_id)
+
+    async def flush(self, guild_id: int):
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            messages = self._buffers.pop(guild_id, None)
+            if not messages:
+                return
+            try:
+                await self._deliver(guild_id, chunk_lines(messages))
+            except Exception as e:
+                logger.error("Failed to deliver %s log messages for guild %s: %s", len(messages), guild_id, e, exc_info=True)
+
+    async def flush_all(self):
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        await asyncio.gather(
+            *(self.flush(guild_id) for guild_id in list(self._buffers)),
+            *list(self._flushes),
+            return_exceptions=True,
+        )
+
+    async def _deliver(self, guild_id: int, chunks: list[str]):
+        cfg = get_guild_config(guild_id)
+        webhook_url = cfg.get("logging_webhook_url")
+        if webhook_url:
+            webhook = discord.Webhook.from_url(webhook_url, client=self.client)
+            try:
+                for chunk in chunks:
+                    await webhook.send(chunk, username=WEBHOOK_NAME)
+                return
+            except discord.NotFound:
+                logger.warning("Logging webhook for guild %s is gone, falling back to the channel.", guild_id)
+                update_guild_config(guild_id, logging_webhook_url="")
+
+        guild = self.client.get_guild(guild_id)
+        log_channel_id = cfg.get("logging_channel_id")
+        log_channel = guild.get_channel(log_channel_id) if guild and log_channel_id else None
+        if not log_channel:
+            return
+        for chunk in chunks:
+            await log_channel.send(chunk)
@@ -1,15 +1,88 @@
-import logging
-import sys
+import atexit, json, logging, os, queue, sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOGGER_NAME = "CiaorellaBot"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_FILE = os.environ.get("LOG_FILE", "")
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", "5"))
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    def prepare(self, record):
+        if record.args and not all(isinstance(arg, _IMMUTABLE) for arg in _args(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+_IMMUTABLE = (str, int, float, bool, type(None))
+
+
+def _args(args):
+    return args.values() if isinstance(args, dict) else args
+
+
+def _formatter():
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(TEXT_FORMAT)
+
+
+def _module_levels(spec):
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def get_logger(name=None):
+    if not name or name == LOGGER_NAME:
+        return logging.getLogger(LOGGER_NAME)
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
 
 def setup_logger():
-    logger = logging.getLogger("CiaorellaBot")
-    logger.setLevel(logging.INFO)
-
-    handler = logging.StreamHandler(sys.stdout)
-    formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s")
-    handler.setFormatter(formatter)
-    if not logger.hasHandlers():
-        logger.addHandler(handler)
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    if logger.handlers:
+        return logger
+
+    formatter = _formatter()
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+        handlers.append(RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(DeferredQueueHandler(log_queue))
+
+    for name, level in _module_levels(LOG_LEVELS).items():
+        get_logger(name).setLevel(level)
     return logger
 
 logger = setup_logger()
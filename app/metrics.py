@@ -0,0 +1,243 @@
+import asyncio, functools, os, threading, time
+from collections import deque
+from contextlib import contextmanager
+
+from logger import get_logger
+from profiling import INTERACTIONS, profiler
+
+logger = get_logger(__name__)
+
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+LOOP_LAG_INTERVAL = float(os.environ.get("LOOP_LAG_INTERVAL", "0.5"))
+LOOP_LAG_WINDOW = 120
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock = threading.Lock()
+_counters: dict[str, dict[tuple, float]] = {}
+_histograms: dict[str, dict[tuple, list]] = {}
+_gauges: dict[str, dict[tuple, object]] = {}
+_help: dict[str, str] = {}
+
+
+def _labels(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def describe(name: str, text: str):
+    _help[name] = text
+
+
+def inc(name: str, amount: float = 1, **labels):
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def observe(name: str, value: float, **labels):
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [[0] * len(DEFAULT_BUCKETS), 0, 0.0]
+        buckets, _, _ = state
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                buckets[i] += 1
+        state[1] += 1
+        state[2] += value
+
+
+def set_counter(name: str, value, **labels):
+    with _lock:
+        _counters.setdefault(name, {})[_labels(labels)] = value
+
+
+def set_gauge(name: str, value, **labels):
+    with _lock:
+        _gauges.setdefault(name, {})[_labels(labels)] = value
+
+
+@contextmanager
+def timer(name: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def track_interaction(custom_id: str):
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                async with profiler.profiled(INTERACTIONS):
+                    return await func(*args, **kwargs)
+            except Exception:
+                inc("errors_total", source="interaction")
+                raise
+            finally:
+                observe("interaction_seconds", time.perf_counter() - started, custom_id=custom_id)
+        return wrapper
+    return decorator
+
+
+def instrument_http(http):
+    original = http.request
+
+    async def request(route, **kwargs):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            return await original(route, **kwargs)
+        except Exception as e:
+            status = str(getattr(e, "status", type(e).__name__))
+            inc("errors_total", source="rest")
+            raise
+        finally:
+            labels = {"method": route.method, "route": route.path}
+            inc("rest_requests_total", status=status, **labels)
+            observe("rest_request_seconds", time.perf_counter() - started, **labels)
+
+    http.request = request
+
+
+async def monitor_loop_lag(interval: float = LOOP_LAG_INTERVAL):
+    loop = asyncio.get_running_loop()
+    window = deque(maxlen=LOOP_LAG_WINDOW)
+    set_gauge("event_loop_lag_max_seconds", lambda: max(window, default=0.0))
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        window.append(lag)
+        observe("event_loop_lag_seconds", lag)
+
+
+def gauge_value(name: str, **labels):
+    with _lock:
+        value = _gauges.get(name, {}).get(_labels(labels))
+    return _gauge_value(value)
+
+
+def counter_value(name: str, **labels) -> float:
+    with _lock:
+        series = _counters.get(name, {})
+        if labels:
+            return _gauge_value(series.get(_labels(labels), 0))
+        return sum(_gauge_value(value) for value in series.values())
+
+
+def histogram_summary(name: str) -> dict[str, tuple[int, float]]:
+    with _lock:
+        series = {key: (state[1], state[2]) for key, state in _histograms.get(name, {}).items()}
+    return {",".join(v for _, v in key) or name: value for key, value in series.items()}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _gauge_value(value):
+    return value() if callable(value) else value
+
+
+def render() -> str:
+    lines = []
+    with _lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {name: {k: (list(s[0]), s[1], s[2]) for k, s in series.items()} for name, series in _histograms.items()}
+        gauges = {name: dict(series) for name, series in _gauges.items()}
+
+    for name, series in sorted(counters.items()):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for key, value in series.items():
+            lines.append(f"{name}{_format_labels(key)} {_gauge_value(value)}")
+
+    for name, series in sorted(histograms.items()):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for key, (buckets, count, total) in series.items():
+            for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', str(bound)),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_count{_format_labels(key)} {count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {total}")
+
+    for name, series in sorted(gauges.items()):
+        if name in _help:
+            lines.append(f"# HELP {name} {_help[name]}")
+        lines.append(f"# TYPE {name} gauge")
+        for key, value in series.items():
+            try:
+                value = _gauge_value(value)
+            except Exception as e:
+                logger.warning("Metrics gauge %s failed: %s", name, e)
+                continue
+            if value is None:
+                continue
+            lines.append(f"{name}{_format_labels(key)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def _handle_scrape(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, render_func=None):
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+            status, body = "200 OK", (await (render_func or _render_async)()).encode()
+        else:
+            status, body = "404 Not Found", b"not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _render_async() -> str:
+    return render()
+
+
+async def start_metrics_server(host: str = METRICS_HOST, port: int = METRICS_PORT, render_func=None):
+    if not port:
+        return None
+    server = await asyncio.start_server(functools.partial(_handle_scrape, render_func=render_func), host, port)
+    logger.info("Serving Prometheus metrics on http://%s:%s/metrics", host, port)
+    return server
+
+
+describe("reconcile_seconds", "Duration of absence reconciliation passes.")
+describe("reconcile_entries_total", "Absence entries processed by reconciliation.")
+describe("storage_load_seconds", "Time spent loading from storage.")
+describe("storage_save_seconds", "Time spent saving to storage.")
+describe("config_cache_total", "Guild config lookups served from cache (hit) or reloaded from storage (miss).")
+describe("rest_requests_total", "Discord REST requests by route and status.")
+describe("rest_request_seconds", "Discord REST request latency by route.")
+describe("interaction_seconds", "Interaction handler latency by custom_id.")
+describe("errors_total", "Errors by source.")
+describe("gateway_latency_seconds", "Discord gateway heartbeat latency.")
+describe("event_loop_lag_seconds", "Delay of event loop wakeups beyond the scheduled time.")
+describe("event_loop_lag_max_seconds", "Largest event loop lag over the last minute.")
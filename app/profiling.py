@@ -0,0 +1,119 @@
+import cProfile, io, os, pstats, time
+from contextlib import asynccontextmanager
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "config/profiles")
+PROFILE_SIGNAL_TARGET = os.environ.get("PROFILE_SIGNAL_TARGET", "interactions")
+PROFILE_SIGNAL_COUNT = int(os.environ.get("PROFILE_SIGNAL_COUNT", "20"))
+PROFILE_TOP = 15
+
+CHECK_DATES = "check_dates"
+INTERACTIONS = "interactions"
+TARGETS = (CHECK_DATES, INTERACTIONS)
+
+
+class ProfileSession:
+    def __init__(self, target: str, count: int, on_done=None):
+        self.target = target
+        self.remaining = count
+        self.count = count
+        self.on_done = on_done
+        self.profile = cProfile.Profile()
+        self.active = 0
+        self.started = None
+
+
+class Profiler:
+    def __init__(self):
+        self.session: ProfileSession | None = None
+        self.last_report: str | None = None
+
+    def arm(self, target: str, count: int, on_done=None) -> bool:
+        if target not in TARGETS:
+            raise ValueError(f"Unknown profiling target: {target}")
+        if self.session is not None:
+            return False
+        self.session = ProfileSession(target, max(1, count), on_done)
+        logger.info("Profiling armed for the next %s %s runs.", count, target)
+        return True
+
+    def cancel(self):
+        session, self.session = self.session, None
+        if session is not None and session.active:
+            session.profile.disable()
+
+    @asynccontextmanager
+    async def profiled(self, target: str):
+        session = self.session
+        if session is None or session.target != target or session.remaining <= 0:
+            yield
+            return
+        session.remaining -= 1
+        if session.active == 0:
+            if session.started is None:
+                session.started = time.perf_counter()
+            session.profile.enable()
+        session.active += 1
+        try:
+            yield
+        finally:
+            session.active -= 1
+            if session.active == 0:
+                session.profile.disable()
+                if session.remaining <= 0 and self.session is session:
+                    self.session = None
+                    await self._finish(session)
+
+    async def _finish(self, session: ProfileSession):
+        path, summary = write_report(session)
+        self.last_report = path
+        logger.info("Profiling of %s %s runs finished, report written to %s", session.count, session.target, path)
+        if session.on_done is not None:
+            try:
+                await session.on_done(path, summary)
+            except Exception as e:
+                logger.error("Error delivering profiling summary: %s", e, exc_info=True)
+
+
+def write_report(session: ProfileSession) -> tuple[str, str]:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    base = os.path.join(PROFILE_DIR, f"{session.target}-{stamp}")
+    session.profile.dump_stats(f"{base}.prof")
+
+    full = io.StringIO()
+    pstats.Stats(session.profile, stream=full).sort_stats("cumulative").print_stats(60)
+    with open(f"{base}.txt", "w", encoding="utf-8") as f:
+        f.write(full.getvalue())
+    return f"{base}.prof", summarize(session.profile)
+
+
+def summarize(profile: cProfile.Profile, top: int = PROFILE_TOP) -> str:
+    stats = pstats.Stats(profile).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+    lines = []
+    for (filename, line, func), (_, calls, _, cumulative, _) in rows:
+        if filename == "~":
+            continue
+        lines.append(f"{cumulative * 1000:9.1f} ms {calls:>7}  {os.path.basename(filename)}:{line}({func})")
+        if len(lines) >= top:
+            break
+    return "\n".join(lines)
+
+
+profiler = Profiler()
+
+
+def install_signal_handler(loop):
+    import signal
+    if not hasattr(signal, "SIGUSR1"):
+        return
+
+    def handle():
+        if not profiler.arm(PROFILE_SIGNAL_TARGET, PROFILE_SIGNAL_COUNT):
+            logger.warning("SIGUSR1 received but a profiling session is already running.")
+
+    loop.add_signal_handler(signal.SIGUSR1, handle)
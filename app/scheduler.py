@@ -0,0 +1,119 @@
+import asyncio, heapq, itertools
+from datetime import datetime, time, timedelta
+
+from config import parse_entry_date
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+MAX_SLEEP_SECONDS = 3600
+RETRY_DELAY = timedelta(minutes=15)
+
+def entry_due_at(entry):
+    return_date = parse_entry_date(entry)
+    if return_date is None:
+        return None
+    if entry.get("notified"):
+        return datetime.combine(return_date + timedelta(days=1), time.min)
+    return datetime.combine(return_date, time.min)
+
+class AbsenceScheduler:
+    def __init__(self, handler, entry_lookup):
+        self._handler = handler
+        self._entry_lookup = entry_lookup
+        self._heap = []
+        self._due = {}
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._task = None
+
+    def __len__(self):
+        return len(self._due)
+
+    def is_running(self):
+        return self._task is not None and not self._task.done()
+
+    def _push(self, key, due):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._counter), key))
+        if self._wakeup is not None and self._heap[0][2] == key:
+            self._wakeup.set()
+
+    def schedule(self, key, entry):
+        if entry is None:
+            self._due.pop(key, None)
+            return
+        due = entry_due_at(entry)
+        if due is None:
+            self._due.pop(key, None)
+            logger.warning("Not scheduling absence entry %s: unparseable date %r", key, entry.get('date'))
+            return
+        if self._due.get(key) != due:
+            self._push(key, due)
+
+    def load(self, entries):
+        self._heap = []
+        self._due = {}
+        for entry in entries:
+            self.schedule((entry.get("guild_id"), entry.get("user_id")), entry)
+
+    def next_due(self):
+        while self._heap:
+            due, _, key = self._heap[0]
+            if self._due.get(key) == due:
+                return due
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now):
+        keys = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, _, key = heapq.heappop(self._heap)
+            del self._due[key]
+            keys.append(key)
+        return keys
+
+    def start(self, entries):
+        self.load(entries)
+        self._task = asyncio.create_task(self._run())
+        logger.info("Absence scheduler started with %s pending deadlines.", len(self))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        self._wakeup = asyncio.Event()
+        while True:
+            now = datetime.now()
+            keys = self.pop_due(now)
+            if keys:
+                logger.info("Scheduler processing %s due absence entries.", len(keys))
+                try:
+                    await self._handler(keys)
+                except Exception as e:
+                    logger.error("Error processing due absence entries: %s", e, exc_info=True)
+                self._reschedule_unchanged(keys, now)
+
+            self._wakeup.clear()
+            next_due = self.next_due()
+            timeout = MAX_SLEEP_SECONDS
+            if next_due is not None:
+                timeout = min(timeout, max((next_due - datetime.now()).total_seconds(), 0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _reschedule_unchanged(self, keys, now):
+        for key in keys:
+            if key in self._due:
+                continue
+            entry = self._entry_lookup(*key)
+            if entry is None:
+                continue
+            due = entry_due_at(entry)
+            if due is None:
+                continue
+            self._push(key, due if due > now else now + RETRY_DELAY)
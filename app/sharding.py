@@ -0,0 +1,59 @@
+import math, os
+
+
+def _parse_shard_ids(spec):
+    ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        ids.extend(range(int(start), int(end or start) + 1))
+    return ids or None
+
+
+SHARD_COUNT = int(os.environ["SHARD_COUNT"]) if os.environ.get("SHARD_COUNT") else None
+SHARD_IDS = _parse_shard_ids(os.environ.get("SHARD_IDS", ""))
+WORKER_ID = int(os.environ.get("CLUSTER_WORKER_ID", "0"))
+
+
+def shard_for(guild_id, shard_count):
+    return (int(guild_id) >> 22) % (shard_count or 1)
+
+
+def is_partitioned():
+    return SHARD_IDS is not None
+
+
+def in_partition(guild_id):
+    if SHARD_IDS is None:
+        return True
+    return guild_id is not None and shard_for(guild_id, SHARD_COUNT) in SHARD_IDS
+
+
+def owns_guild(bot, guild_id):
+    shard_ids = getattr(bot, "shard_ids", None)
+    if shard_ids is None:
+        return True
+    return shard_for(guild_id, bot.shard_count) in shard_ids
+
+
+def shard_is_ready(bot, guild_id):
+    ready = getattr(bot, "ready_shards", None)
+    if ready is None:
+        return True
+    return shard_for(guild_id, getattr(bot, "shard_count", None)) in ready
+
+
+def shard_stats(bot):
+    guild_counts = {}
+    for guild in bot.guilds:
+        guild_counts[guild.shard_id] = guild_counts.get(guild.shard_id, 0) + 1
+    latencies = dict(getattr(bot, "latencies", None) or [(0, bot.latency)])
+    return {
+        shard_id: {
+            "latency": latency if math.isfinite(latency) else None,
+            "guilds": guild_counts.get(shard_id, 0),
+        }
+        for shard_id, latency in sorted(latencies.items())
+    }
@@ -0,0 +1,416 @@
+import asyncio, json, os, sqlite3, threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from logger import get_logger
+from dates import to_iso
+from metrics import timer
+
+logger = get_logger(__name__)
+
+ABSENCE_COLUMNS = ("guild_id", "user_id", "username", "date", "notified")
+WRITE_DELAY = float(os.environ.get("STORAGE_WRITE_DELAY", "0.5"))
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SQLITE_BUSY_TIMEOUT", "30"))
+
+def _absence_key(entry):
+    return (entry.get("guild_id"), entry.get("user_id"))
+
+def _return_date_iso(date_str):
+    return to_iso(date_str)
+
+def atomic_write(path, text):
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(directory, os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+def dump_compact(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+class WriteBehind:
+    def __init__(self, path, serialize, lock, delay=WRITE_DELAY, on_written=None, target=None):
+        self.path = path
+        self.target = target or os.path.basename(path)
+        self.delay = delay
+        self._serialize = serialize
+        self._lock = lock
+        self._on_written = on_written
+        self._state_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self.writes = 0
+
+    @property
+    def pending(self):
+        return self._dirty
+
+    def mark_dirty(self):
+        with self._state_lock:
+            self._dirty = True
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run(self):
+        with self._state_lock:
+            self._timer = None
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error("Write-behind flush of %s failed: %s", self.path, e, exc_info=True)
+            self.mark_dirty()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._state_lock:
+                if not self._dirty:
+                    return False
+                self._dirty = False
+            try:
+                with timer("storage_save_seconds", target=self.target):
+                    with self._lock:
+                        text = self._serialize()
+                    atomic_write(self.path, text)
+            except Exception:
+                with self._state_lock:
+                    self._dirty = True
+                raise
+            self.writes += 1
+            logger.debug("Wrote %s (%s bytes).", self.path, len(text))
+            if self._on_written:
+                self._on_written()
+            return True
+
+    def close(self):
+        with self._state_lock:
+            timer, self._timer = self._timer, None
+        if timer is not None:
+            timer.cancel()
+        self.flush()
+
+class StorageWorker:
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="storage")
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+
+    def submit(self, func, *args):
+        future = self._executor.submit(func, *args)
+        with self._pending_lock:
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._pending_lock:
+            self._pending.discard(future)
+        error = future.exception()
+        if error is not None:
+            logger.error("Background storage write failed: %s", error, exc_info=error)
+
+    @property
+    def pending(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def drain(self):
+        with self._pending_lock:
+            pending = list(self._pending)
+        for future in pending:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+    async def run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+class JsonStorage:
+    name = "json"
+    write_behind = True
+
+    def __init__(self, data_file, config_file, delay=WRITE_DELAY):
+        self.data_file = data_file
+        self.config_file = config_file
+        self._lock = threading.Lock()
+        self._absences = {}
+        self._configs = {}
+        self._config_mtime = None
+        self._config_generation = 0
+        self._absence_writer = WriteBehind(
+            data_file, lambda: dump_compact(list(self._absences.values())), self._lock, delay, target="absences"
+        )
+        self._config_writer = WriteBehind(
+            config_file, lambda: dump_compact(self._configs), self._lock, delay,
+            on_written=self._remember_config_mtime, target="config",
+        )
+
+    def _read(self, path, default):
+        if os.path.isfile(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except json.JSONDecodeError:
+                backup = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                os.replace(path, backup)
+                logger.error("JSON decode error in %s, moved it to %s.", path, backup)
+                return default
+        logger.warning("%s not found, using defaults.", path)
+        return default
+
+    def _mtime(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _remember_config_mtime(self):
+        self._config_mtime = self._mtime(self.config_file)
+
+    def load_absences(self):
+        logger.info("Loading absence data...")
+        data = self._read(self.data_file, [])
+        with self._lock:
+            self._absences = {_absence_key(entry): dict(entry) for entry in data}
+        return data
+
+    def apply_absence_changes(self, upserts, deletes):
+        with self._lock:
+            for entry in upserts:
+                self._absences[_absence_key(entry)] = dict(entry)
+            for key in deletes:
+                self._absences.pop(key, None)
+        logger.debug("Queued %s absence upserts and %s deletes for %s.", len(upserts), len(deletes), self.data_file)
+        self._absence_writer.mark_dirty()
+
+    def replace_absences(self, entries):
+        with self._lock:
+            self._absences = {}
+        self.apply_absence_changes(entries, ())
+
+    def load_guild_configs(self):
+        logger.info("Loading config file...")
+        mtime = self._mtime(self.config_file)
+        configs = self._read(self.config_file, {})
+        with self._lock:
+            self._configs = {gid: dict(cfg) for gid, cfg in configs.items()}
+            self._config_mtime = mtime
+        return configs
+
+    def save_guild_config(self, guild_id, cfg):
+        with self._lock:
+            self._configs[str(guild_id)] = dict(cfg)
+        self._config_writer.mark_dirty()
+
+    def replace_guild_configs(self, configs):
+        with self._lock:
+            self._configs = {str(gid): dict(cfg) for gid, cfg in configs.items()}
+        self._config_writer.mark_dirty()
+
+    def config_version(self):
+        if self._config_writer.pending:
+            return self._config_generation
+        mtime = self._mtime(self.config_file)
+        if mtime != self._config_mtime:
+            self._config_mtime = mtime
+            self._config_generation += 1
+        return self._config_generation
+
+    def flush(self):
+        self._absence_writer.flush()
+        self._config_writer.flush()
+
+    def close(self):
+        self._absence_writer.close()
+        self._config_writer.close()
+
+class SqliteStorage:
+    name = "sqlite"
+    write_behind = False
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS absences (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT,
+            date TEXT,
+            return_date TEXT,
+            notified INTEGER NOT NULL DEFAULT 0,
+            extra TEXT,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_absences_return_date ON absences (return_date);
+        CREATE TABLE IF NOT EXISTS guild_config (
+            guild_id TEXT PRIMARY KEY,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(db_file), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_file, check_same_thread=False, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        logger.info("Opened SQLite storage at %s.", db_file)
+
+    def _row(self, entry):
+        extra = {k: v for k, v in entry.items() if k not in ABSENCE_COLUMNS}
+        return (
+            entry.get("guild_id"),
+            entry.get("user_id"),
+            entry.get("username"),
+            entry.get("date"),
+            _return_date_iso(entry.get("date")),
+            1 if entry.get("notified") else 0,
+            json.dumps(extra, ensure_ascii=False) if extra else None,
+        )
+
+    def _entry(self, row):
+        guild_id, user_id, username, date, notified, extra = row
+        entry = {
+            "user_id": user_id,
+            "username": username,
+            "date": date,
+            "notified": bool(notified),
+            "guild_id": guild_id,
+        }
+        if extra:
+            entry.update(json.loads(extra))
+        return entry
+
+    def load_absences(self):
+        logger.info("Loading absence data...")
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT guild_id, user_id, username, date, notified, extra FROM absences"
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def _apply(self, upserts, deletes):
+        logger.debug("Applying %s absence upserts and %s deletes to SQLite.", len(upserts), len(deletes))
+        if upserts:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO absences "
+                "(guild_id, user_id, username, date, return_date, notified, extra) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._row(entry) for entry in upserts],
+            )
+        if deletes:
+            self._conn.executemany(
+                "DELETE FROM absences WHERE guild_id = ? AND user_id = ?",
+                list(deletes),
+            )
+
+    def apply_absence_changes(self, upserts, deletes):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._apply(upserts, deletes)
+
+    def replace_absences(self, entries):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM absences")
+            self._apply(entries, ())
+
+    def load_guild_configs(self):
+        logger.info("Loading guild config from SQLite...")
+        with self._lock:
+            rows = self._conn.execute("SELECT guild_id, data FROM guild_config").fetchall()
+        return {guild_id: json.loads(data) for guild_id, data in rows}
+
+    def _bump_config_revision(self):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('config_revision', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def save_guild_config(self, guild_id, cfg):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO guild_config (guild_id, data) VALUES (?, ?)",
+                (str(guild_id), json.dumps(cfg, ensure_ascii=False)),
+            )
+            self._bump_config_revision()
+
+    def replace_guild_configs(self, configs):
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM guild_config")
+            self._conn.executemany(
+                "INSERT INTO guild_config (guild_id, data) VALUES (?, ?)",
+                [(str(gid), json.dumps(cfg, ensure_ascii=False)) for gid, cfg in configs.items()],
+            )
+            self._bump_config_revision()
+
+    def config_version(self):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'config_revision'").fetchone()
+        return int(row[0]) if row else 0
+
+    def get_meta(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def migrate_json_to_sqlite(storage, data_file, config_file):
+    if storage.get_meta("json_migrated"):
+        return False
+    source = JsonStorage(data_file, config_file)
+    absences = source.load_absences() if os.path.isfile(data_file) else []
+    configs = source.load_guild_configs() if os.path.isfile(config_file) else {}
+    storage.apply_absence_changes(absences, ())
+    for guild_id, cfg in configs.items():
+        storage.save_guild_config(guild_id, cfg)
+    storage.set_meta("json_migrated", datetime.now().isoformat(timespec="seconds"))
+    for path in (data_file, config_file):
+        if os.path.isfile(path):
+            os.replace(path, path + ".migrated")
+    logger.info("Migrated %s absence entries and %s guild configs from JSON to SQLite.", len(absences), len(configs))
+    return True
+
+def open_storage(backend, data_file, config_file, db_file):
+    if backend == "sqlite":
+        storage = SqliteStorage(db_file)
+        migrate_json_to_sqlite(storage, data_file, config_file)
+        return storage
+    if backend != "json":
+        logger.warning("Unknown storage backend '%s', falling back to JSON.", backend)
+    return JsonStorage(data_file, config_file)
+
+if __name__ == "__main__":
+    import sys
+    from config import DATA_FILE, CONFIG_FILE, DB_FILE
+    if sys.argv[1:] != ["migrate"]:
+        raise SystemExit("Usage: python storage.py migrate")
+    if not migrate_json_to_sqlite(SqliteStorage(DB_FILE), DATA_FILE, CONFIG_FILE):
+        logger.info("SQLite storage was already migrated, nothing to do.")
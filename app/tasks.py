@@ -1,148 +1,227 @@
-import random
-from datetime import datetime
+import asyncio, os, random, time
+from datetime import date
 import discord
-from discord import Forbidden, HTTPException
 from discord.ext import tasks
 
 from localization import tg
 from config import (
-    load_data, save_data, get_guild_config,
-    get_member, get_role, modify_role, DEFAULT_ROLE_NAME
+    absences, add_entry_listener, entry_lock, get_all_entries, update_entry, persist_entries,
+    get_guild_config, get_member, resolve_members, get_absence_role, modify_role, parse_entry_date,
+    DEFAULT_ROLE_NAME
 )
-from logger import logger
-from absence import ExtendAbsenceView
+from logger import get_logger
+from dates import format_date
+from absence import get_extend_view, log_absence_event_by_guild
+from scheduler import AbsenceScheduler
+from metrics import inc, observe
+from profiling import CHECK_DATES, profiler
+from sharding import owns_guild, shard_is_ready
+
+logger = get_logger(__name__)
+
+
+REMOVE = "remove"
+NOTIFIED = "notified"
+SWEEP_INTERVAL_HOURS = 6
+RECONCILE_CONCURRENCY = int(os.environ.get("RECONCILE_CONCURRENCY", "8"))
+
+
+async def reconcile_entry(bot, entry, today):
+    guild = bot.get_guild(entry["guild_id"])
+    if not guild:
+        return REMOVE if shard_is_ready(bot, entry["guild_id"]) else None
+
+    cfg = get_guild_config(guild.id)
+    role_name = cfg.get("role_name", DEFAULT_ROLE_NAME)
+    role = get_absence_role(guild, cfg)
+    member = await get_member(guild, entry["user_id"])
+
+    if member is None:
+        await log_absence_event_by_guild(
+            bot,
+            guild.id,
+            tg(
+                guild.id,
+                "log.entry_deleted_user_left",
+                guild=guild.name,
+                username=entry.get("username", "Unknown"),
+                user_id=entry["user_id"],
+            )
+        )
+        return REMOVE
+
+    if role is None:
+        await log_absence_event_by_guild(
+            bot,
+            guild.id,
+            tg(
+                guild.id,
+                "log.entry_deleted_role_not_found",
+                guild=guild.name,
+                role_name=role_name,
+                user=member.mention,
+            )
+        )
+        return REMOVE
+
+    if role not in member.roles:
+        await log_absence_event_by_guild(
+            bot,
+            guild.id,
+            tg(
+                guild.id,
+                "log.entry_deleted_role_missing",
+                guild=guild.name,
+                user=member.mention,
+                role=role.name,
+            )
+        )
+        bot.dm_queue.enqueue(
+            member.id,
+            tg(
+                guild.id,
+                "dm.absence_entry_deleted_role_removed",
+                guild=guild.name,
+                role=role.name,
+            )
+        )
+        return REMOVE
+
+    username = entry.get("username", "Unknown")
+    user_date_str = format_date(entry.get("date"))
+    notified = entry.get("notified", False)
+
+    user_date = parse_entry_date(entry)
+    if user_date is None:
+        logger.error("Bad date format for %s: %s", username, entry.get('date'))
+        return None
+
+    if not notified and user_date == today:
+        bot.dm_queue.enqueue(
+            entry["user_id"],
+            tg(
+                guild.id,
+                "dm.return_day_reached",
+                guild=guild.name,
+                date=user_date_str,
+            ),
+            view=get_extend_view(guild.id),
+            entry_key=(guild.id, entry["user_id"]),
+        )
+        return NOTIFIED
+
+    if user_date < today and role in member.roles:
+        if await modify_role(member, role, add=False):
+            bot.dm_queue.enqueue(
+                member.id,
+                tg(
+                    guild.id,
+                    "dm.absence_expired_role_removed",
+                    guild=guild.name,
+                    date=user_date_str,
+                    role=role.name,
+                )
+            )
+            return REMOVE
+    return None
+
+
+async def _reconcile_guild(bot, guild_id, entries, today, semaphore, removed, notified_keys, conflicts):
+    async with semaphore:
+        guild = bot.get_guild(guild_id)
+        if guild is not None:
+            await resolve_members(guild, [entry["user_id"] for entry in entries])
+        for entry in entries:
+            key = (guild_id, entry["user_id"])
+            async with entry_lock(*key):
+                entry = absences.get(*key)
+                if entry is None:
+                    continue
+                version = absences.version(*key)
+                try:
+                    result = await reconcile_entry(bot, entry, today)
+                except Exception as e:
+                    logger.error("Error reconciling absence entry %s: %s", key, e, exc_info=True)
+                    inc("errors_total", source="reconcile")
+                    continue
+                if result == REMOVE:
+                    applied = absences.remove(*key, persist=False, expected_version=version)
+                    target = removed
+                elif result == NOTIFIED:
+                    applied = update_entry(key[1], guild_id, persist=False, expected_version=version, notified=True)
+                    target = notified_keys
+                else:
+                    continue
+                if applied is None:
+                    logger.warning("Absence entry %s changed during reconciliation, keeping the newer version.", key)
+                    conflicts.append(key)
+                else:
+                    target.append(key)
+
+
+async def reconcile_entries(bot, entries):
+    started = time.perf_counter()
+    today = date.today()
+    removed = []
+    notified_keys = []
+    conflicts = []
+
+    by_guild = {}
+    skipped = 0
+    for entry in entries:
+        if not owns_guild(bot, entry["guild_id"]):
+            skipped += 1
+            continue
+        by_guild.setdefault(entry["guild_id"], []).append(entry)
+    entries_processed = len(entries) - skipped
+
+    semaphore = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+    await asyncio.gather(*(
+        _reconcile_guild(bot, guild_id, guild_entries, today, semaphore, removed, notified_keys, conflicts)
+        for guild_id, guild_entries in by_guild.items()
+    ))
+
+    if removed or notified_keys:
+        persist_entries()
+        logger.info("Absence data updated after reconciliation/notifications.")
+
+    duration = time.perf_counter() - started
+    observe("reconcile_seconds", duration)
+    inc("reconcile_entries_total", entries_processed)
+    inc("reconcile_removed_total", len(removed))
+    inc("reconcile_notified_total", len(notified_keys))
+    inc("reconcile_conflicts_total", len(conflicts))
+    bot.last_reconcile_stats = {
+        "duration": duration,
+        "entries": entries_processed,
+        "skipped": skipped,
+        "guilds": len(by_guild),
+        "removed": len(removed),
+        "notified": len(notified_keys),
+        "conflicts": len(conflicts),
+    }
+    logger.info(
+        "Reconciled %s entries across %s guilds in %.3fs (concurrency %s, %s entries of other shards skipped).",
+        entries_processed, len(by_guild), duration, RECONCILE_CONCURRENCY, skipped
+    )
 
 
 def register_tasks(bot):
-    @tasks.loop(minutes=1)
+    reconcile_lock = asyncio.Lock()
+
+    async def process_due(keys):
+        entries = [entry for entry in (absences.get(*key) for key in keys) if entry is not None]
+        async with reconcile_lock, profiler.profiled(CHECK_DATES):
+            await reconcile_entries(bot, entries)
+
+    bot.absence_scheduler = AbsenceScheduler(process_due, absences.get)
+    add_entry_listener(bot.absence_scheduler.schedule)
+
+    @tasks.loop(hours=SWEEP_INTERVAL_HOURS)
     async def check_dates():
-        logger.info("Running absence check task...")
-        data = load_data()
-        today = datetime.now()
-        changed = False
-
-        for entry in data:
-            guild = bot.get_guild(entry["guild_id"])
-            if not guild:
-                entry["remove"] = True
-                changed = True
-                continue
-
-            cfg = get_guild_config(guild.id)
-            role_name = cfg.get("role_name", DEFAULT_ROLE_NAME)
-            role = get_role(guild, role_name)
-            member = await get_member(guild, entry["user_id"])
-
-            log_channel_id = cfg.get("logging_channel_id")
-            log_ch = guild.get_channel(log_channel_id) if log_channel_id else None
-
-            if member is None:
-                if log_ch:
-                    await log_ch.send(
-                        tg(
-                            guild.id,
-                            "log.entry_deleted_user_left",
-                            guild=guild.name,
-                            username=entry.get("username", "Unknown"),
-                            user_id=entry["user_id"],
-                        )
-                    )
-                entry["remove"] = True
-                changed = True
-                continue
-
-            if role is None:
-                if log_ch:
-                    await log_ch.send(
-                        tg(
-                            guild.id,
-                            "log.entry_deleted_role_not_found",
-                            guild=guild.name,
-                            role_name=role_name,
-                            user=member.mention,
-                        )
-                    )
-                entry["remove"] = True
-                changed = True
-                continue
-
-            if role not in member.roles:
-                if log_ch:
-                    await log_ch.send(
-                        tg(
-                            guild.id,
-                            "log.entry_deleted_role_missing",
-                            guild=guild.name,
-                            user=member.mention,
-                            role=role.name,
-                        )
-                    )
-                try:
-                    await member.send(
-                        tg(
-                            guild.id,
-                            "dm.absence_entry_deleted_role_removed",
-                            guild=guild.name,
-                            role=role.name,
-                        )
-                    )
-                except (Forbidden, HTTPException):
-                    pass
-
-                entry["remove"] = True
-                changed = True
-                continue
-
-            username = entry.get("username", "Unknown")
-            user_date_str = entry.get("date")
-            notified = entry.get("notified", False)
-
-            try:
-                user_date_dt = datetime.strptime(user_date_str, "%d.%m.%Y")
-            except Exception:
-                logger.error(f"Bad date format for {username}: {user_date_str}")
-                continue
-
-            if not notified and user_date_dt.date() == today.date():
-                user = bot.get_user(entry["user_id"])
-                if user:
-                    try:
-                        await user.send(
-                            tg(
-                                guild.id,
-                                "dm.return_day_reached",
-                                guild=guild.name,
-                                date=user_date_str,
-                            ),
-                            view=ExtendAbsenceView(guild.id)
-                        )
-                        entry["notified"] = True
-                        changed = True
-                    except (Forbidden, HTTPException):
-                        pass
-                continue
-
-            if user_date_dt.date() < today.date() and role in member.roles:
-                if await modify_role(member, role, add=False):
-                    try:
-                        await member.send(
-                            tg(
-                                guild.id,
-                                "dm.absence_expired_role_removed",
-                                guild=guild.name,
-                                date=user_date_str,
-                                role=role.name,
-                            )
-                        )
-                    except (Forbidden, HTTPException):
-                        pass
-                    entry["remove"] = True
-                    changed = True
-                continue
-
-        if changed:
-            save_data([e for e in data if not e.get("remove")])
-            logger.info("Absence data updated after reconciliation/notifications.")
+        logger.info("Running absence reconciliation sweep...")
+        async with reconcile_lock, profiler.profiled(CHECK_DATES):
+            await reconcile_entries(bot, get_all_entries())
 
     statuses = [
         "Zählt die Panzer, die du verloren hast…",
@@ -160,7 +239,7 @@ def register_tasks(bot):
     async def change_status():
         status = random.choice(statuses)
         await bot.change_presence(activity=discord.CustomActivity(name=status))
-        logger.info(f"Changed status to: {status}")
+        logger.info("Changed status to: %s", status)
 
     bot.check_dates_loop = check_dates
     bot.change_status_loop = change_status
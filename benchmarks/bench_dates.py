@@ -0,0 +1,53 @@
+import os, re, sys, timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from dates import format_date, parse_date
+
+LEGACY_DATE_PATTERN = re.compile(
+    r"^(?:31\.(?:0[13578]|1[02])\.\d{4}|"
+    r"(?:29|30\.(?:0[1,3-9]|1[0-2])\.\d{4})|"
+    r"(?:0[1-9]|1\d|2[0-8])\.(?:0[1-9]|1[0-2])\.\d{4}|"
+    r"29\.02\.(?:[02468][048]00|[13579][26]00|\d{2}[048]|\d{2}[13579][26]))$"
+)
+
+SAMPLES = ["31.12.2030", "01.03.2031", "29.02.2032", "15.07.2030", "31.04.2030", "abc"]
+ISO_SAMPLES = ["2030-12-31", "2031-03-01", "2032-02-29", "2030-07-15"]
+
+
+def legacy_parse(text):
+    if not LEGACY_DATE_PATTERN.match(text):
+        return None
+    try:
+        return datetime.strptime(text, "%d.%m.%Y")
+    except ValueError:
+        return None
+
+
+def legacy_entry_date(text):
+    return datetime.strptime(text, "%d.%m.%Y").date()
+
+
+def bench(label, func, samples, number):
+    seconds = timeit.timeit(lambda: [func(s) for s in samples], number=number)
+    per_call = seconds / (number * len(samples)) * 1e9
+    print(f"{label:<40} {per_call:8.0f} ns/call")
+    return per_call
+
+
+def main(number=20000):
+    results = {
+        "user_input_legacy": bench("user input: regex + strptime", legacy_parse, SAMPLES, number),
+        "user_input_fast": bench("user input: parse_date", parse_date, SAMPLES, number),
+        "stored_legacy": bench("stored date: strptime(%d.%m.%Y)", legacy_entry_date, SAMPLES[:4], number),
+        "stored_fast": bench("stored date: parse_date(ISO)", parse_date, ISO_SAMPLES, number),
+        "display": bench("display: format_date", format_date, [parse_date(s) for s in ISO_SAMPLES], number),
+    }
+    print(f"user input speedup: {results['user_input_legacy'] / results['user_input_fast']:.1f}x")
+    print(f"stored date speedup: {results['stored_legacy'] / results['stored_fast']:.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import asyncio, contextlib, itertools, os, tempfile
+import discord
+
+_ids = itertools.count(10_000_000)
+
+
+def next_id():
+    return next(_ids)
+
+
+@contextlib.contextmanager
+def scratch_dir(prefix):
+    import config
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=prefix) as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            config.flush_storage()
+            config._storage = None
+            os.chdir(previous)
+
+
+class FakeResponse:
+    status = 404
+    reason = "Not Found"
+
+
+class FakeRole:
+    def __init__(self, guild, name, role_id=None):
+        self.guild = guild
+        self.name = name
+        self.id = role_id or next_id()
+
+    def __eq__(self, other):
+        return isinstance(other, FakeRole) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeUser:
+    def __init__(self, user_id, name="user"):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.mention = f"<@{user_id}>"
+        self.sent = []
+
+    def __str__(self):
+        return self.name
+
+    async def send(self, content=None, **kwargs):
+        self.sent.append(content)
+
+
+class FakeMember(FakeUser):
+    def __init__(self, guild, user_id, roles=()):
+        super().__init__(user_id, f"member{user_id}")
+        self.guild = guild
+        self.roles = list(roles)
+
+    async def add_roles(self, role, reason=None):
+        await self.guild.client.rest_call()
+        if role not in self.roles:
+            self.roles.append(role)
+
+    async def remove_roles(self, role, reason=None):
+        await self.guild.client.rest_call()
+        if role in self.roles:
+            self.roles.remove(role)
+
+
+class FakeMessage:
+    def __init__(self, channel, author, embeds=()):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.author = author
+        self.embeds = list(embeds)
+
+    async def edit(self, embed=None, view=None):
+        self.embeds = [embed] if embed else self.embeds
+        return self
+
+    async def delete(self):
+        self.channel.messages.remove(self)
+
+
+class FakePartialMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+
+    def _resolve(self):
+        for message in self.channel.messages:
+            if message.id == self.id:
+                return message
+        raise discord.NotFound(FakeResponse(), "Unknown Message")
+
+    async def edit(self, **kwargs):
+        return await self._resolve().edit(**kwargs)
+
+    async def delete(self):
+        await self._resolve().delete()
+
+
+class FakeChannel:
+    def __init__(self, guild, name="general"):
+        self.guild = guild
+        self.id = next_id()
+        self.name = name
+        self.mention = f"<#{self.id}>"
+        self.messages = []
+        self.sent = []
+        self.history_reads = 0
+
+    async def send(self, content=None, embed=None, view=None):
+        await self.guild.client.rest_call()
+        self.sent.append(content)
+        message = FakeMessage(self, self.guild.client.user, [embed] if embed else [])
+        self.messages.append(message)
+        return message
+
+    async def history(self, limit=100):
+        self.history_reads += 1
+        for message in list(reversed(self.messages))[:limit]:
+            yield message
+
+    async def fetch_message(self, message_id):
+        return FakePartialMessage(self, message_id)._resolve()
+
+    def get_partial_message(self, message_id):
+        return FakePartialMessage(self, message_id)
+
+    def permissions_for(self, member):
+        return discord.Permissions.all()
+
+
+class FakeGuild:
+    def __init__(self, client, guild_id, name=None):
+        self.client = client
+        self.id = guild_id
+        self.name = name or f"guild{guild_id}"
+        self.absence_role = FakeRole(self, "Abwesend")
+        self.roles = [FakeRole(self, f"role{i}") for i in range(50)] + [self.absence_role]
+        self._roles = {role.id: role for role in self.roles}
+        self._members = {}
+        self.log_channel = FakeChannel(self, "log")
+        self.panel_channel = FakeChannel(self, "absence")
+        self.text_channels = [self.panel_channel, self.log_channel]
+        self._channels = {ch.id: ch for ch in self.text_channels}
+        self.me = FakeMember(self, client.user.id)
+        self.shard_id = 0
+
+    def add_member(self, user_id, absent=True):
+        member = FakeMember(self, user_id, [self.absence_role] if absent else [])
+        self._members[user_id] = member
+        return member
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+    async def fetch_member(self, user_id):
+        await self.client.rest_call()
+        member = self._members.get(user_id)
+        if member is None:
+            raise discord.NotFound(FakeResponse(), "Unknown Member")
+        return member
+
+    async def query_members(self, user_ids=None, limit=5, cache=True):
+        await self.client.rest_call()
+        return [self._members[uid] for uid in user_ids if uid in self._members]
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+
+class FakeInteractionResponse:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, content=None, **kwargs):
+        self.messages.append(content)
+
+    async def defer(self, **kwargs):
+        pass
+
+    async def send_modal(self, modal):
+        self.messages.append(modal)
+
+
+class FakeInteraction:
+    def __init__(self, client, guild, user):
+        self.client = client
+        self.guild = guild
+        self.user = user
+        self.response = FakeInteractionResponse()
+        self.followup = FakeInteractionResponse()
+
+
+class FakeBot:
+    def __init__(self, rest_latency=0.0):
+        self.user = FakeUser(1, "Ciaorella")
+        self.rest_latency = rest_latency
+        self._guilds = {}
+        self._users = {}
+
+    async def rest_call(self):
+        if self.rest_latency:
+            await asyncio.sleep(self.rest_latency)
+
+    @property
+    def guilds(self):
+        return list(self._guilds.values())
+
+    def add_guild(self, guild_id):
+        guild = FakeGuild(self, guild_id)
+        self._guilds[guild_id] = guild
+        return guild
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(guild_id)
+
+    def get_user(self, user_id):
+        return self._users.setdefault(user_id, FakeUser(user_id))
+
+    async def fetch_user(self, user_id):
+        return self.get_user(user_id)
@@ -0,0 +1,209 @@
+import argparse, asyncio, contextlib, io, json, os, platform, sys, time
+from datetime import date, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+from absence import _extend_absence, _set_absence, get_manager_payload
+from dm_queue import DMQueue
+from localization import tg
+from log_digest import LogDigest
+from tasks import register_tasks
+import bench_dates
+from fakes import FakeBot, FakeInteraction, scratch_dir
+from logger import logger
+from metrics import gauge_value, monitor_loop_lag
+
+logger.setLevel(os.environ.get("BENCH_LOG_LEVEL", "ERROR"))
+
+GUILDS = 50
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def make_bot(entries, guilds=GUILDS):
+    bot = FakeBot()
+    bot.log_digest = LogDigest(bot)
+    bot.dm_queue = DMQueue(bot)
+    config._entry_listeners.clear()
+    register_tasks(bot)
+    for guild_index in range(guilds):
+        guild = bot.add_guild(1000 + guild_index)
+        config.update_guild_config(guild.id, logging_channel_id=guild.log_channel.id)
+
+    today = date.today()
+    data = []
+    for i in range(entries):
+        guild = bot.get_guild(1000 + i % guilds)
+        user_id = 100_000 + i
+        bucket = i % 20
+        if bucket == 0:
+            return_date = today
+        elif bucket == 1:
+            return_date = today - timedelta(days=1)
+        else:
+            return_date = today + timedelta(days=bucket)
+        if bucket != 2:
+            guild.add_member(user_id, absent=bucket != 3)
+        data.append({
+            "user_id": user_id,
+            "username": f"member{user_id}",
+            "date": return_date.isoformat(),
+            "notified": False,
+            "guild_id": guild.id,
+        })
+    config.save_data(data)
+    return bot
+
+
+async def bench_check_dates(size):
+    bot = make_bot(size)
+    started = time.perf_counter()
+    await bot.check_dates_loop()
+    elapsed = time.perf_counter() - started
+    await bot.log_digest.flush_all()
+    return {"seconds": elapsed, "entries_per_second": size / elapsed}
+
+
+async def bench_entry_mutations(size):
+    bot = make_bot(0)
+    guild = bot.get_guild(1000)
+    until = (date.today() + timedelta(days=14)).isoformat()
+
+    started = time.perf_counter()
+    for i in range(size):
+        config.add_or_update_entry(200_000 + i, "bench", until, guild.id)
+    add_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(size):
+        interaction = FakeInteraction(bot, guild, guild.add_member(200_000 + i))
+        await _extend_absence(interaction, weeks=2, guild_id=guild.id)
+    extend_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(size):
+        config.remove_entry(200_000 + i, guild.id)
+    remove_seconds = time.perf_counter() - started
+    await bot.log_digest.flush_all()
+    return {
+        "add_or_update_per_second": size / add_seconds,
+        "extend_per_second": size / extend_seconds,
+        "remove_per_second": size / remove_seconds,
+    }
+
+
+async def bench_interaction_latency(size, interactions=500):
+    bot = make_bot(size)
+    guild = bot.get_guild(1000)
+    lag_task = asyncio.create_task(monitor_loop_lag(interval=0.001))
+    await asyncio.sleep(0.01)
+    latencies = []
+    for i in range(interactions):
+        interaction = FakeInteraction(bot, guild, guild.add_member(300_000 + i, absent=False))
+        started = time.perf_counter()
+        await _set_absence(interaction, days=14)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0)
+    await asyncio.sleep(0.01)
+    lag_task.cancel()
+    await bot.log_digest.flush_all()
+    config.flush_storage()
+    latencies.sort()
+    return {
+        "p50_seconds": latencies[len(latencies) // 2],
+        "p99_seconds": latencies[int(len(latencies) * 0.99)],
+        "max_loop_lag_seconds": gauge_value("event_loop_lag_max_seconds"),
+    }
+
+
+def bench_tg(calls=200_000):
+    config.update_guild_config(42, language="en")
+    started = time.perf_counter()
+    for _ in range(calls):
+        tg(42, "log.absence_set", user="<@1>", date="01.01.2030")
+    return {"lookups_per_second": calls / (time.perf_counter() - started)}
+
+
+async def bench_ensure_single_embed(history=200, rounds=50):
+    bot = make_bot(0, guilds=1)
+    guild = bot.get_guild(1000)
+    channel = guild.panel_channel
+    for _ in range(history):
+        await channel.send("chatter")
+    embed, view = get_manager_payload(guild.id)
+
+    started = time.perf_counter()
+    await config.ensure_single_embed(channel, bot, embed, view)
+    first = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await config.ensure_single_embed(channel, bot, embed, view)
+    steady = (time.perf_counter() - started) / rounds
+    return {"first_seconds": first, "steady_seconds": steady, "history_reads": channel.history_reads}
+
+
+async def run_suite(sizes):
+    results = {}
+    for size in sizes:
+        results[f"check_dates_{size}"] = await bench_check_dates(size)
+    for size in sizes:
+        results[f"interaction_latency_{size}"] = await bench_interaction_latency(size)
+    for size in sizes:
+        results[f"entry_mutations_{size}"] = await bench_entry_mutations(min(size, 10_000))
+    results["tg"] = bench_tg()
+    results["ensure_single_embed"] = await bench_ensure_single_embed()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results["dates"] = bench_dates.main(number=2000)
+    return results
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(name, {}).get(metric)
+            if not old:
+                continue
+            higher_is_better = metric.endswith("per_second") or metric.endswith("speedup")
+            ratio = value / old if higher_is_better else old / value
+            if ratio < 1 - threshold:
+                regressions.append(f"{name}.{metric}: {old:.6g} -> {value:.6g}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Ciaorella benchmark suite.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--baseline", help="Compare against a previous JSON result file.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before failing (default 0.2).")
+    args = parser.parse_args()
+
+    with scratch_dir("ciaorella-bench-"):
+        results = asyncio.run(run_suite(args.sizes))
+    report = {
+        "python": platform.python_version(),
+        "storage": config.STORAGE_BACKEND,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    print(text)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
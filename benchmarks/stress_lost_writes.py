@@ -0,0 +1,157 @@
+import argparse, asyncio, os, random, sys, time
+from datetime import date, timedelta
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+sys.path.insert(0, APP_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import config
+import tasks
+from absence import _extend_absence, _set_absence
+from dm_queue import DMQueue
+from localization import tg
+from log_digest import LogDigest
+from fakes import FakeBot, FakeInteraction, scratch_dir
+from logger import logger
+
+logger.setLevel(os.environ.get("BENCH_LOG_LEVEL", "CRITICAL"))
+
+GUILDS = 20
+EXTEND_DAYS = 14
+
+
+def make_bot(users, latency, first_guild):
+    bot = FakeBot(rest_latency=latency)
+    bot.log_digest = LogDigest(bot)
+    bot.dm_queue = DMQueue(bot)
+    for guild_index in range(GUILDS):
+        guild = bot.add_guild(first_guild + guild_index)
+        config.update_guild_config(guild.id, logging_channel_id=guild.log_channel.id)
+
+    today = date.today()
+    data = []
+    for i in range(users):
+        guild = bot.get_guild(first_guild + i % GUILDS)
+        user_id = 100_000 + i
+        kind = i % 3
+        guild.add_member(user_id, absent=kind != 2)
+        data.append({
+            "user_id": user_id,
+            "username": f"member{user_id}",
+            "date": (today if kind == 0 else today - timedelta(days=1)).isoformat(),
+            "notified": False,
+            "guild_id": guild.id,
+        })
+    config.save_data(data)
+    return bot
+
+
+async def legacy_reconcile(bot, entries):
+    today = date.today()
+    removed, notified = [], []
+
+    async def reconcile_guild(guild_entries):
+        for entry in guild_entries:
+            result = await tasks.reconcile_entry(bot, entry, today)
+            key = (entry["guild_id"], entry["user_id"])
+            if result == tasks.REMOVE:
+                removed.append(key)
+            elif result == tasks.NOTIFIED:
+                notified.append(key)
+
+    by_guild = {}
+    for entry in entries:
+        by_guild.setdefault(entry["guild_id"], []).append(entry)
+    await asyncio.gather(*(reconcile_guild(guild_entries) for guild_entries in by_guild.values()))
+
+    for guild_id, user_id in notified:
+        config.update_entry(user_id, guild_id, persist=False, notified=True)
+    for guild_id, user_id in removed:
+        config.absences.remove(guild_id, user_id, persist=False)
+    config.persist_entries()
+
+
+async def interact(bot, guild, user_id, delay, extend):
+    await asyncio.sleep(delay)
+    interaction = FakeInteraction(bot, guild, guild.get_member(user_id))
+    if extend:
+        await _extend_absence(interaction, weeks=EXTEND_DAYS // 7, guild_id=guild.id)
+        return interaction.response.messages[-1] != tg(guild.id, "absence.no_active_hint")
+    await _set_absence(interaction, days=EXTEND_DAYS)
+    return True
+
+
+def lost_writes(bot, written):
+    expected = (date.today() + timedelta(days=EXTEND_DAYS)).isoformat()
+    lost = 0
+    for guild, user_id in written:
+        entry = config.get_entry(user_id, guild.id)
+        member = guild.get_member(user_id)
+        if (
+            entry is None
+            or entry["date"] != expected
+            or entry.get("notified")
+            or guild.absence_role not in member.roles
+        ):
+            lost += 1
+    return lost
+
+
+async def run(mode, users, share, latency, seed):
+    rng = random.Random(seed)
+    bot = make_bot(users, latency, 1000 if mode == "current" else 2000)
+    entries = list(config.get_all_entries())
+    targets = rng.sample(entries, int(len(entries) * share))
+    window = latency * 2 * users / GUILDS
+    plan = []
+    for entry in targets:
+        guild = bot.get_guild(entry["guild_id"])
+        plan.append((entry, guild, guild.absence_role in guild.get_member(entry["user_id"]).roles))
+
+    reconcile = tasks.reconcile_entries if mode == "current" else legacy_reconcile
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        reconcile(bot, entries),
+        *(
+            interact(bot, guild, entry["user_id"], rng.uniform(0, window), absent and rng.random() < 0.5)
+            for entry, guild, absent in plan
+        ),
+    )
+    elapsed = time.perf_counter() - started
+    written = [(guild, entry["user_id"]) for (entry, guild, _), wrote in zip(plan, results[1:]) if wrote]
+    await bot.log_digest.flush_all()
+    await asyncio.to_thread(config.flush_storage)
+    return {
+        "mode": mode,
+        "interactions": len(targets),
+        "writes": len(written),
+        "lost": lost_writes(bot, written),
+        "conflicts": (getattr(bot, "last_reconcile_stats", None) or {}).get("conflicts", 0),
+        "seconds": elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run reconciliation concurrently with interactions and count lost writes.")
+    parser.add_argument("--users", type=int, default=2_000)
+    parser.add_argument("--share", type=float, default=0.3, help="Share of users that interact during reconciliation.")
+    parser.add_argument("--latency", type=float, default=0.002, help="Simulated REST latency in seconds.")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--legacy", action="store_true", help="Also run the old snapshot-then-apply reconciliation for comparison.")
+    args = parser.parse_args()
+
+    modes = ["legacy", "current"] if args.legacy else ["current"]
+    failed = False
+    for mode in modes:
+        with scratch_dir("ciaorella-stress-"):
+            result = asyncio.run(run(mode, args.users, args.share, args.latency, args.seed))
+        print(
+            f"{result['mode']:>8}: {result['writes']}/{result['interactions']} interactions wrote, "
+            f"{result['lost']} lost, {result['conflicts']} reconcile conflicts, {result['seconds']:.2f}s"
+        )
+        failed = failed or (mode == "current" and result["lost"] > 0)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()